@@ -0,0 +1,190 @@
+""" load_test.py
+Throughput and latency of the API under N concurrent users.
+Requests go through the FastAPI app in-process (httpx ASGITransport), with the LLM replaced
+by a stub that waits a fixed latency, so the numbers measure the server itself: the request
+executor, retrieval and the SQLite stores. Event loop lag shows whether blocking work is
+still running on the loop.
+Usage (from the server directory, needs a populated news database):
+    python -m src.benchmarks.load_test --users 32 --requests 20 --latency 0.5
+    python -m src.benchmarks.load_test --users 32 --worker_threads 4 --query_concurrency 2
+"""
+import re
+import time
+import random
+import asyncio
+import argparse
+import statistics
+
+import httpx
+
+from .. import server
+from ..models.BaseModelClient import BaseModelClient
+from ..models.Rerankers import LLMReranker
+from ..utils.RequestExecutor import RequestExecutor
+
+# share of each request type in a user's session
+SCENARIOS = {
+    "query": 0.3,
+    "daily_news": 0.2,
+    "click": 0.2,
+    "interests": 0.15,
+    "bookmarks": 0.15,
+}
+
+QUERIES = [
+    "latest AI model releases",
+    "upcoming video games",
+    "AI regulation in Europe",
+    "electric vehicle sales",
+    "new smartphone launches",
+]
+
+
+class StubModelClient(BaseModelClient):
+    # answers every prompt in the format its caller parses, after a fixed delay
+    def __init__(self, latency=0.5):
+        super().__init__("stub")
+        self.latency = latency
+
+    def respond(self, prompt, context=None):
+        if context and "web_search_required" in context:
+            query = re.search(r"user_query='(.*?)'", prompt)
+            rag_query = query.group(1) if query else "news"
+            return f"<response>web_search_required=false, web_search_phrase='', rag_query='{rag_query}'</response>"
+        if context and "rank all" in context:
+            article_count = prompt.count("index=")
+            return f"<response>[{', '.join(str(i) for i in range(article_count))}]</response>"
+        if "<keywords>" in prompt:
+            return "<keywords>news, technology</keywords>"
+        return "<response>Here is a short summary of the selected articles.</response>"
+
+    def generate(self, prompt, context=None):
+        time.sleep(self.latency)
+        return self.respond(prompt, context)
+
+    async def get_model_response_async(self, prompt, context=None):
+        await asyncio.sleep(self.latency)
+        return self.respond(prompt, context)
+
+    async def stream_model_response_async(self, prompt, context=None):
+        await asyncio.sleep(self.latency)
+        for word in self.respond(prompt, context).split(" "):
+            yield word + " "
+
+    async def close(self):
+        pass
+
+
+async def measure_loop_lag(lags, stop, interval=0.01):
+    # a heartbeat that wakes up late means the loop was blocked in between
+    while not stop.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start_time - interval)
+
+
+async def run_user(client, user, request_count, results):
+    user_id = f"load-user-{user}"
+    workspace_id = f"load-workspace-{user}"
+    article_ids = []
+
+    for _ in range(request_count):
+        scenario = random.choices(list(SCENARIOS), weights=list(SCENARIOS.values()))[0]
+        if scenario == "click" and not article_ids:
+            scenario = "interests"
+
+        start_time = time.perf_counter()
+        try:
+            if scenario == "query":
+                response = await client.post("/api/query", json={"query": random.choice(QUERIES), "user_id": user_id, "workspace_id": workspace_id})
+            elif scenario == "daily_news":
+                response = await client.get(f"/api/daily_news/{user_id}/{workspace_id}")
+            elif scenario == "click":
+                response = await client.post(f"/api/click_article/{user_id}/{workspace_id}/{random.choice(article_ids)}")
+            elif scenario == "interests":
+                response = await client.get(f"/api/interests/{user_id}/{workspace_id}")
+            else:
+                response = await client.get(f"/api/bookmarks/{user_id}/{workspace_id}")
+            ok = response.status_code == 200
+        except Exception:
+            response = None
+            ok = False
+        results.append((scenario, time.perf_counter() - start_time, ok))
+
+        # later clicks go to articles this user was shown
+        if ok and scenario in ("query", "daily_news"):
+            article_ids.extend(article["id"] for article in response.json().get("articles", []))
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def report(results, elapsed, lags):
+    print(f"{'request':<12} {'count':>7} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9}")
+    for scenario in SCENARIOS:
+        latencies = sorted(latency for name, latency, _ in results if name == scenario)
+        if not latencies:
+            continue
+        errors = sum(1 for name, _, ok in results if name == scenario and not ok)
+        print(f"{scenario:<12} {len(latencies):7d} {errors:7d} {statistics.median(latencies) * 1000:9.1f} "
+              f"{percentile(latencies, 0.95) * 1000:9.1f} {latencies[-1] * 1000:9.1f}")
+
+    print(f"\ntotal: {len(results)} requests in {elapsed:.2f}s, {len(results) / elapsed:.1f} req/s")
+    if lags:
+        lags.sort()
+        print(f"event loop lag: p50 {statistics.median(lags) * 1000:.1f} ms, p99 {percentile(lags, 0.99) * 1000:.1f} ms, max {lags[-1] * 1000:.1f} ms")
+
+
+async def main(args):
+    stub = StubModelClient(latency=args.latency)
+    server.rag_query.model = stub
+    if isinstance(server.rag_query.reranker, LLMReranker):
+        server.rag_query.reranker.model = stub
+    if not args.response_cache:
+        # every query runs the whole pipeline
+        server.rag_query.response_cache = None
+
+    if args.worker_threads or args.query_concurrency:
+        route_limits = dict(server.request_executor.route_limits)
+        if args.query_concurrency:
+            route_limits["query"] = args.query_concurrency
+        server.request_executor = RequestExecutor(
+            max_workers=args.worker_threads or server.config.server["worker_threads"],
+            route_limits=route_limits
+        )
+
+    await server.startup()
+
+    lags = []
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(lags, stop))
+
+    results = []
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test", timeout=None) as client:
+        start_time = time.perf_counter()
+        await asyncio.gather(*(run_user(client, user, args.requests, results) for user in range(args.users)))
+        elapsed = time.perf_counter() - start_time
+
+    stop.set()
+    await lag_task
+    await server.shutdown()
+
+    print(f"{args.users} users x {args.requests} requests, stub model latency {args.latency}s\n")
+    report(results, elapsed, lags)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=32, help="Concurrent users")
+    parser.add_argument("--requests", type=int, default=20, help="Requests per user")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds the stub model takes per completion")
+    parser.add_argument("--worker_threads", type=int, default=None, help="Override server.worker_threads of config.json")
+    parser.add_argument("--query_concurrency", type=int, default=None, help="Override server.query_concurrency of config.json")
+    parser.add_argument("--response_cache", action="store_true", help="Keep the semantic response cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    asyncio.run(main(args))
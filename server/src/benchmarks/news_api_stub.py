@@ -0,0 +1,171 @@
+""" news_api_stub.py
+Local stand-in for NewsAPI and TheNewsAPI, with configurable latency, server errors and rate limiting.
+Usage (from the server directory):
+    python -m src.benchmarks.news_api_stub --serve --port 8765 --fail_rate 0.1
+        then run the fetcher against it with NEWS_API_URL=http://127.0.0.1:8765/v2
+        and THE_NEWS_API_URL=http://127.0.0.1:8765/v1
+    python -m src.benchmarks.news_api_stub --pages 10
+        compare sequential bare requests with the pooled client fetching pages concurrently
+"""
+import json
+import time
+import random
+import argparse
+import threading
+import requests
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from ..utils.HttpClient import HttpClient, HttpRequestError
+
+PAGE_SIZE = 100
+
+
+class StubState:
+    def __init__(self, total_results, latency, fail_rate, rate_limit):
+        self.total_results = total_results
+        self.latency = latency
+        self.fail_rate = fail_rate
+        # requests per second before answering 429
+        self.rate_limit = rate_limit
+        self.window_start = time.time()
+        self.window_count = 0
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def rate_limited(self):
+        if not self.rate_limit:
+            return False
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count > self.rate_limit
+
+
+def make_handler(state):
+    class StubHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, body, headers=None):
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def article(self, i):
+            host = f"http://{self.headers.get('Host')}"
+            return {
+                "title": f"Stub article {i}",
+                "description": f"Description of stub article {i}",
+                "url": f"{host}/articles/{i}",
+                "publishedAt": "2025-01-01T00:00:00Z",
+                "source": {"name": "stub"}
+            }
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            with state.lock:
+                state.counts["requests"] += 1
+            time.sleep(state.latency)
+
+            if state.rate_limited():
+                with state.lock:
+                    state.counts["rate_limited"] += 1
+                return self.send_json(429, {"status": "error", "code": "rateLimited"}, {"Retry-After": "1"})
+
+            if url.path.startswith("/v") and random.random() < state.fail_rate:
+                with state.lock:
+                    state.counts["errors"] += 1
+                return self.send_json(500, {"status": "error", "code": "unexpectedError"})
+
+            if url.path in ("/v2/everything", "/v2/top-headlines"):
+                page = int(query.get("page", 1))
+                start = (page - 1) * PAGE_SIZE
+                articles = [self.article(i) for i in range(start, min(start + PAGE_SIZE, state.total_results))]
+                return self.send_json(200, {"status": "ok", "totalResults": state.total_results, "articles": articles})
+
+            if url.path == "/v1/news/all":
+                limit = int(query.get("limit", 3))
+                return self.send_json(200, {"data": [self.article(i) for i in range(limit)]})
+
+            if url.path.startswith("/articles/"):
+                i = url.path.rsplit("/", 1)[-1]
+                body = (
+                    f"<html><head><title>Stub article {i}</title></head><body><article>"
+                    f"<h1>Stub article {i}</h1>"
+                    + "".join(f"<p>Paragraph {n} of stub article {i}, served by the local news API stub.</p>" for n in range(5))
+                    + "</article></body></html>"
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                return
+
+            self.send_json(404, {"status": "error", "code": "notFound"})
+
+    return StubHandler
+
+
+def start_stub(port=0, total_results=1000, latency=0.1, fail_rate=0.0, rate_limit=0):
+    state = StubState(total_results, latency, fail_rate, rate_limit)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, state
+
+
+def bench(args):
+    server, state = start_stub(total_results=args.pages * PAGE_SIZE, latency=args.latency, fail_rate=args.fail_rate, rate_limit=args.rate_limit)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v2/everything"
+    pages = range(1, args.pages + 1)
+
+    # what DataFetcher did before: one new connection per page, no retries
+    start_time = time.time()
+    failed = 0
+    for page in pages:
+        if requests.get(base_url, params={"page": page}).status_code != 200:
+            failed += 1
+    print(f"{'sequential requests.get':<28} {time.time() - start_time:8.2f}s  failed pages: {failed}")
+
+    client = HttpClient(pool_size=args.workers, backoff_factor=0.2)
+    start_time = time.time()
+    results = client.get_json_many([(base_url, {"page": page}) for page in pages], workers=args.workers)
+    failed = sum(isinstance(result, HttpRequestError) for result in results)
+    print(f"{'pooled client, concurrent':<28} {time.time() - start_time:8.2f}s  failed pages: {failed}")
+    print(f"stub counters: {state.counts}")
+
+    client.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--serve", action="store_true", help="Only run the stub server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=10, help="Pages of 100 articles served")
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before each response")
+    parser.add_argument("--fail_rate", type=float, default=0.0, help="Share of API requests answered with 500")
+    parser.add_argument("--rate_limit", type=int, default=0, help="Requests per second before answering 429, 0 for no limit")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.serve:
+        server, _ = start_stub(args.port, args.pages * PAGE_SIZE, args.latency, args.fail_rate, args.rate_limit)
+        print(f"Serving news API stub on http://127.0.0.1:{server.server_address[1]}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        bench(args)
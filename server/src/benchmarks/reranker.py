@@ -0,0 +1,102 @@
+""" reranker.py
+Compare latency and ranking agreement of the LLM and cross-encoder rerankers
+on a fixed candidate set.
+Usage (from the server directory, UST_API_KEY required for the LLM ranker):
+    python -m src.benchmarks.reranker --runs 5
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from dotenv import load_dotenv
+
+from ..models.USTModelClient import USTModelClient
+from ..models.Rerankers import LLMReranker, CrossEncoderReranker
+
+load_dotenv()
+
+CANDIDATES = [
+    ("Nvidia unveils next-generation AI chips", "Nvidia announced a new data center GPU aimed at training large language models, promising faster training and lower power use."),
+    ("Nintendo confirms release date for new console", "Nintendo revealed when its next console will launch and showed a lineup of first-party games coming at launch."),
+    ("OpenAI releases updated reasoning model", "OpenAI shipped a new model that improves on math and coding benchmarks and is available through the API."),
+    ("EU agrees on rules for general purpose AI", "European lawmakers reached a deal on obligations for providers of general purpose AI models, including transparency requirements."),
+    ("Apple reports record services revenue", "Apple's quarterly results showed services revenue at an all-time high while iPhone sales were flat."),
+    ("Startup raises $50M for battery recycling", "A battery recycling startup closed a Series B round to build a plant that recovers lithium and cobalt from used cells."),
+    ("Microsoft adds AI assistant to Windows", "Microsoft is rolling out an AI assistant integrated into Windows that can change settings and summarize documents."),
+    ("Indie studio's roguelike tops Steam charts", "A small indie studio's roguelike game became the most played title on Steam in its first week."),
+    ("Google DeepMind model predicts weather", "DeepMind published a machine learning weather model that outperforms traditional forecasts on medium-range predictions."),
+    ("Cyberattack disrupts hospital systems", "A ransomware attack forced several hospitals to divert patients while IT teams restored systems from backups."),
+]
+
+QUERIES = [
+    "latest AI model releases",
+    "upcoming video games",
+    "AI regulation in Europe",
+]
+
+
+def build_articles():
+    return [
+        {"id": str(i), "page_content": summary, "metadata": {"title": title}}
+        for i, (title, summary) in enumerate(CANDIDATES)
+    ]
+
+
+def kendall_tau(ranking_a, ranking_b):
+    # rank correlation over the items both rankings contain
+    common = [i for i in ranking_a if i in ranking_b]
+    position_b = {item: pos for pos, item in enumerate(ranking_b)}
+    concordant, discordant = 0, 0
+    for x in range(len(common)):
+        for y in range(x + 1, len(common)):
+            if position_b[common[x]] < position_b[common[y]]:
+                concordant += 1
+            else:
+                discordant += 1
+    pairs = concordant + discordant
+    return (concordant - discordant) / pairs if pairs else 0.0
+
+
+def top_k_overlap(ranking_a, ranking_b, k=3):
+    return len(set(ranking_a[:k]) & set(ranking_b[:k])) / k
+
+
+async def time_ranking(reranker, query, articles, runs):
+    latencies = []
+    ranking = []
+    for _ in range(runs):
+        start_time = time.perf_counter()
+        ranking = await reranker.rank(query, articles)
+        latencies.append(time.perf_counter() - start_time)
+    return ranking, latencies
+
+
+async def main(runs):
+    articles = build_articles()
+    llm_reranker = LLMReranker(USTModelClient())
+    cross_encoder = CrossEncoderReranker()
+
+    # load the model before timing
+    cross_encoder.load()
+
+    print(f"{'query':<30} {'llm p50':>9} {'ce p50':>9} {'tau':>6} {'top3':>6}")
+    for query in QUERIES:
+        llm_ranking, llm_latencies = await time_ranking(llm_reranker, query, articles, runs)
+        ce_ranking, ce_latencies = await time_ranking(cross_encoder, query, articles, runs)
+
+        print(
+            f"{query:<30} {statistics.median(llm_latencies):8.3f}s {statistics.median(ce_latencies):8.3f}s "
+            f"{kendall_tau(llm_ranking, ce_ranking):6.2f} {top_k_overlap(llm_ranking, ce_ranking):6.2f}"
+        )
+        print(f"    llm: {llm_ranking}")
+        print(f"    ce:  {ce_ranking}")
+
+    await llm_reranker.model.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3, help="Timed runs per query and reranker")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.runs))
@@ -0,0 +1,136 @@
+""" sqlite_concurrency.py
+Concurrent bookmark reads and writes against a temporary database, comparing
+    legacy  - one connection shared by all threads, rollback journal, no indexes
+    storage - per-thread connections of SQLiteStorage, WAL, indexed lookups
+Usage (from the server directory):
+    python -m src.benchmarks.sqlite_concurrency --threads 16 --ops 500
+"""
+import os
+import time
+import uuid
+import random
+import sqlite3
+import argparse
+import tempfile
+import threading
+import statistics
+
+from ..databases.Storage import SQLiteStorage
+
+CREATE_TABLE = """
+    CREATE TABLE IF NOT EXISTS bookmarks (
+        bookmark_id TEXT PRIMARY KEY,
+        article_id TEXT,
+        title TEXT,
+        summary TEXT,
+        url TEXT,
+        tags TEXT,
+        fetch_date TEXT,
+        note TEXT,
+        user_id TEXT,
+        workspace_id TEXT
+    )
+"""
+CREATE_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_bookmarks_workspace ON bookmarks (user_id, workspace_id)",
+    "CREATE INDEX IF NOT EXISTS idx_bookmarks_article ON bookmarks (article_id, user_id, workspace_id)",
+]
+
+
+class LegacyDatabase:
+    # what BookmarkDatabase did before: a single connection for every request
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def execute(self, sql, params=(), commit=False):
+        # the shared cursor is not safe across threads, so access is serialized
+        with self.lock:
+            rows = self.conn.execute(sql, params).fetchall()
+            if commit:
+                self.conn.commit()
+            return rows
+
+
+class StorageDatabase:
+    def __init__(self, path):
+        self.storage = SQLiteStorage(path)
+
+    def execute(self, sql, params=(), commit=False):
+        rows = self.storage.execute(sql, params).fetchall()
+        if commit:
+            self.storage.commit()
+        return rows
+
+
+def bookmark_row(workspace):
+    return (str(uuid.uuid4()), str(uuid.uuid4()), "title", "summary " * 50, "https://example.com", "[]", "0", "", "user", workspace)
+
+
+def populate(path, rows, workspaces, indexed):
+    conn = sqlite3.connect(path)
+    conn.execute(CREATE_TABLE)
+    if indexed:
+        for statement in CREATE_INDEXES:
+            conn.execute(statement)
+    conn.executemany("INSERT INTO bookmarks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [bookmark_row(f"ws{i % workspaces}") for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def run(db, threads, ops, workspaces, write_ratio):
+    latencies = []
+    errors = []
+    latencies_lock = threading.Lock()
+
+    def worker():
+        local_latencies = []
+        for _ in range(ops):
+            workspace = f"ws{random.randrange(workspaces)}"
+            start_time = time.perf_counter()
+            try:
+                if random.random() < write_ratio:
+                    db.execute("INSERT INTO bookmarks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", bookmark_row(workspace), commit=True)
+                elif random.random() < 0.5:
+                    db.execute("SELECT * FROM bookmarks WHERE user_id=? AND workspace_id=?", ("user", workspace))
+                else:
+                    db.execute("SELECT 1 FROM bookmarks WHERE article_id=? AND user_id=? AND workspace_id=?", (str(uuid.uuid4()), "user", workspace))
+            except sqlite3.OperationalError as e:
+                errors.append(str(e))
+            local_latencies.append(time.perf_counter() - start_time)
+        with latencies_lock:
+            latencies.extend(local_latencies)
+
+    start_time = time.perf_counter()
+    workers = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    latencies.sort()
+    return {
+        "ops/s": len(latencies) / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "errors": len(errors)
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--ops", type=int, default=500, help="Operations per thread")
+    parser.add_argument("--rows", type=int, default=20000, help="Bookmarks in the database before the run")
+    parser.add_argument("--workspaces", type=int, default=200)
+    parser.add_argument("--write_ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'ops/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errors':>8}")
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, database_class, indexed in [("legacy", LegacyDatabase, False), ("storage", StorageDatabase, True)]:
+            path = os.path.join(directory, f"{mode}.db")
+            populate(path, args.rows, args.workspaces, indexed)
+            result = run(database_class(path), args.threads, args.ops, args.workspaces, args.write_ratio)
+            print(f"{mode:<10} {result['ops/s']:10.1f} {result['p50 ms']:10.2f} {result['p95 ms']:10.2f} {result['errors']:8d}")
@@ -0,0 +1,56 @@
+""" startup.py
+Measure startup time and memory of the databases loaded by the server.
+Usage (from the server directory):
+    python -m src.benchmarks.startup            # lazy, shared embedding model
+    python -m src.benchmarks.startup --eager    # force loading the model at startup
+"""
+import time
+import resource
+import argparse
+
+from ..utils.ServerConfig import ServerConfig
+from ..databases.ArticleRag import RagDatabase
+from ..databases.Interest import InterestDatabase
+
+
+def current_rss_mb():
+    # resident set size of this process from /proc, falls back to peak rss
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def report(label, start_time):
+    print(f"{label:<28} {time.time() - start_time:8.2f}s {current_rss_mb():10.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eager", action="store_true", help="Load the embedding model during startup")
+    args = parser.parse_args()
+
+    print(f"{'stage':<28} {'elapsed':>9} {'rss':>13}")
+    start_time = time.time()
+    report("baseline", start_time)
+
+    config = ServerConfig()
+    rag_db = RagDatabase(config)
+    report("RagDatabase", start_time)
+
+    interest_db = InterestDatabase(config, rag_db=rag_db)
+    report("InterestDatabase", start_time)
+
+    if args.eager:
+        rag_db.embedding_function.load()
+        report("embedding model loaded", start_time)
+
+    shared = rag_db.embedding_function is interest_db.embedding_function
+    print(f"embedding function shared: {shared}, loaded: {rag_db.embedding_function.is_loaded()}")
+
+    rag_db.similarity_search("latest AI news", n_results=1)
+    report("first query", start_time)
@@ -1,28 +1,45 @@
 import os
-import ast
 import uuid
+import numpy as np
 import json 
-import datetime
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import threading
+from datetime import datetime, timedelta
 
+from .ChromaRegistry import get_client, get_embedding_function
+from .ArticleTags import ArticleTagIndex
 from ..utils.Logger import setup_logger
+from ..utils.ServerConfig import ServerConfig
+from ..utils.EmbeddingCache import QueryEmbeddingCache
+from ..utils.Tags import parse_tags, serialize_tags
 
 class RagDatabase:
-    def __init__(self):
+    def __init__(self, config=None):
         self.logger = setup_logger("rag", stream=False)
+        self.config = config if config else ServerConfig()
         # database settings
         self.collection_name = "news_articles"
         
         cur_path = os.path.dirname(os.path.abspath(__file__))
         self.database_dir = f"{cur_path}/../../database/NewsAgentChroma"
         
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="sentence-transformers/all-mpnet-base-v2"
+        # shared with other databases, model is loaded on first encode
+        self.embedding_function = get_embedding_function(self.config.embedding["model_name"])
+        self.client = get_client(self.database_dir)
+        
+        # repeated queries (e.g. daily news tags) skip re-encoding
+        self.query_cache = QueryEmbeddingCache(
+            maxsize=self.config.embedding["query_cache_size"],
+            ttl=self.config.embedding["query_cache_ttl"]
         )
         
-        self.client = chromadb.PersistentClient(path=self.database_dir, settings=Settings(allow_reset=True))
+        # hashes of urls stored in the database
+        self.url_index = set()
+        self.url_index_lock = threading.Lock()
+        # one reload at a time after articles of other processes
+        self.sync_lock = threading.Lock()
+        
+        # tag <-> article id index, maintained on insert, update and delete
+        self.tag_index = ArticleTagIndex(f"{cur_path}/../../database/NewsAgent.db")
         
         self.load_database()
     
@@ -40,10 +57,108 @@ class RagDatabase:
             self.logger.error(f"Failed to load database: {e}")
             raise e
         
-    def similarity_search(self, query, n_results=5):
+        self.build_url_index()
+        
+        if not self.tag_index.is_migrated("structured_tags"):
+            self.migrate_tags()
+    
+    '''
+    URL index for deduplication, kept in memory to avoid a metadata scan per article
+    '''
+    @staticmethod
+    def url_hash(url):
+        return uuid.uuid3(uuid.NAMESPACE_URL, url).bytes
+    
+    def build_url_index(self, page_size=5000):
+        url_index = set()
+        offset = 0
+        while True:
+            docs = self.db.get(include=["metadatas"], limit=page_size, offset=offset)
+            for metadata in docs["metadatas"]:
+                if metadata and metadata.get("url"):
+                    url_index.add(self.url_hash(metadata["url"]))
+            
+            if len(docs["ids"]) < page_size:
+                break
+            offset += page_size
+        
+        with self.url_index_lock:
+            self.url_index = url_index
+        self.logger.info(f"Built URL index with {len(url_index)} urls")
+    
+    @property
+    def version(self):
+        # identifies the article snapshot for cached responses, persisted so ingestions
+        # of other processes (e.g. the DataFetcher CLI or an sbatch job) change it too
+        return self.tag_index.snapshot()
+    
+    def add_urls(self, urls):
+        with self.url_index_lock:
+            self.url_index.update(self.url_hash(url) for url in urls if url)
+    
+    def remove_urls(self, urls):
+        with self.url_index_lock:
+            self.url_index.difference_update(self.url_hash(url) for url in urls if url)
+    
+    def sync_indexes(self):
+        # articles inserted or deleted by another process (e.g. the DataFetcher CLI) since the indexes were built
+        with self.sync_lock:
+            if self.tag_index.sync():
+                self.build_url_index()
+    
+    # return urls that are not in the database yet, keeping order and dropping repeats within the batch
+    def filter_new_urls(self, urls):
+        self.sync_indexes()
+        new_urls = []
+        seen = set()
+        with self.url_index_lock:
+            for url in urls:
+                url_hash = self.url_hash(url)
+                if url_hash in self.url_index or url_hash in seen:
+                    continue
+                seen.add(url_hash)
+                new_urls.append(url)
+        
+        self.logger.info(f"Filtered {len(urls)} urls, {len(new_urls)} are new")
+        return new_urls
+        
+    def embed_query(self, query):
+        # embed the cache key, so every spelling sharing an entry gets the same vector
+        query = self.query_cache.normalize(query)
+        embedding = self.query_cache.get(query)
+        if embedding is None:
+            embedding = self.embedding_function([query])[0]
+            self.query_cache.set(query, embedding)
+        return embedding
+    
+    # unify format of chroma results, tags come from the tag index as a list
+    def to_articles(self, ids, documents, metadatas, distances=None):
+        articles = []
+        for i, (article_id, document, metadata) in enumerate(zip(ids, documents, metadatas)):
+            metadata = dict(metadata) if metadata else {}
+            # the index misses articles it has no rows for, fall back to the tags stored with the article
+            metadata["tags"] = self.tag_index.get_tags(article_id) or parse_tags(metadata.get("tags"))
+            # only used to find untagged articles in chroma, not part of the article
+            metadata.pop("tag_count", None)
+            article = {
+                "id": article_id,
+                "page_content": document,
+                "metadata": metadata
+            }
+            # distance to the query, used as a ranking signal
+            if distances is not None:
+                article["distance"] = float(distances[i])
+            articles.append(article)
+        return articles
+    
+    def similarity_search(self, query, n_results=5, tags=None):
+        # restrict the search to articles having any of the tags
+        if tags:
+            return self.tag_filtered_search(query, tags, n_results)
+        
         try:
             results = self.db.query(
-                query_texts=[query],
+                query_embeddings=[self.embed_query(query)],
                 n_results=n_results
             )
             self.logger.info(f"Fetched {n_results} results for query: {query}. Results: {results}")
@@ -52,30 +167,53 @@ class RagDatabase:
             return None
         
         
-        results = [
-            {
-                "id": doc[0],
-                "page_content": doc[1],
-                "metadata": doc[2]
-            }
-            for doc in zip(results['ids'][0], results['documents'][0], results['metadatas'][0])
-        ]
+        results = self.to_articles(results['ids'][0], results['documents'][0], results['metadatas'][0], results['distances'][0])
         
         return results
     
+    def tag_filtered_search(self, query, tags, n_results=5):
+        # pick up articles tagged by other processes since the index was loaded
+        self.sync_indexes()
+        article_ids = list(self.tag_index.get_articles(tags))
+        if not article_ids:
+            return []
+        
+        try:
+            docs = self.db.get(ids=article_ids, include=["embeddings", "documents", "metadatas"])
+            query_embedding = np.asarray(self.embed_query(query))
+        except Exception as e:
+            self.logger.error(f"Failed to fetch results for query: {query} with tags {tags}. Error: {e}")
+            return None
+        
+        # squared l2 distance, same metric as the collection index
+        distances = ((np.asarray(docs["embeddings"]) - query_embedding) ** 2).sum(axis=1)
+        order = np.argsort(distances)[:n_results]
+        
+        self.logger.info(f"Fetched {len(order)} results for query: {query} among {len(article_ids)} articles with tags {tags}")
+        return self.to_articles(
+            [docs["ids"][i] for i in order],
+            [docs["documents"][i] for i in order],
+            [docs["metadatas"][i] for i in order],
+            [distances[i] for i in order]
+        )
+    
+    # store tags as JSON in metadata and return them as a list for the tag index
+    def prepare_metadata(self, metadata):
+        metadata = dict(metadata)
+        tags = list(dict.fromkeys(parse_tags(metadata.get("tags"))))
+        metadata["tags"] = serialize_tags(tags)
+        metadata["tag_count"] = len(tags)
+        return metadata, tags
     
     def article_exist(self, url):
-        doc = self.db.get(where={"url": url})
-        
-        self.logger.info(f"Fetched document with URL: {url}. Document: {doc}")
         # return if the document exist
-        if doc and len(doc["documents"]) > 0:
-            return True
-        else:
-            return False
+        self.sync_indexes()
+        with self.url_index_lock:
+            return self.url_hash(url) in self.url_index
     
     def insert_article(self, document, metadata):
         article_id = str(uuid.uuid4())
+        metadata, tags = self.prepare_metadata(metadata)
         # insert document into the database
         try:
             self.db.add(
@@ -83,10 +221,54 @@ class RagDatabase:
                 metadatas=[metadata],
                 ids=[article_id]
             )
+            self.add_urls([metadata.get("url")])
+            self.tag_index.set_tags({article_id: tags})
             self.logger.info(f"Inserted article with UUID: {article_id}")
         except Exception as e:
             self.logger.error(f"Failed to insert article: {e}")
     
+    def insert_articles(self, documents, metadatas, batch_size=32):
+        """
+        Insert articles in batches so the embedding model encodes a whole batch per forward pass.
+        :return: list of booleans, True if the article at the same position was inserted
+        """
+        results = [False] * len(documents)
+        prepared = [self.prepare_metadata(metadata) for metadata in metadatas]
+        metadatas = [metadata for metadata, _ in prepared]
+        tags = [tags for _, tags in prepared]
+        
+        for start in range(0, len(documents), batch_size):
+            end = min(start + batch_size, len(documents))
+            article_ids = [str(uuid.uuid4()) for _ in range(start, end)]
+            try:
+                self.db.add(
+                    documents=documents[start:end],
+                    metadatas=metadatas[start:end],
+                    ids=article_ids
+                )
+                results[start:end] = [True] * (end - start)
+                self.add_urls([metadata.get("url") for metadata in metadatas[start:end]])
+                self.tag_index.set_tags(dict(zip(article_ids, tags[start:end])))
+                self.logger.info(f"Inserted batch of {end - start} articles")
+            except Exception as e:
+                # isolate the failing article(s) so one bad article does not drop the batch
+                self.logger.error(f"Failed to insert batch of {end - start} articles, retrying one by one: {e}")
+                for i, article_id in zip(range(start, end), article_ids):
+                    try:
+                        self.db.add(
+                            documents=[documents[i]],
+                            metadatas=[metadatas[i]],
+                            ids=[article_id]
+                        )
+                        results[i] = True
+                        self.add_urls([metadatas[i].get("url")])
+                        self.tag_index.set_tags({article_id: tags[i]})
+                    except Exception as e:
+                        self.logger.error(f"Failed to insert article {metadatas[i].get('url')}: {e}")
+        
+        self.logger.info(f"Inserted {sum(results)} of {len(documents)} articles")
+        return results
+    
     def get_article_by_id(self, article_id):
         try:
             docs = self.db.get(
@@ -95,15 +277,9 @@ class RagDatabase:
             self.logger.info(f"Fetched article with UUID: {article_id}. Document: {docs}")
         except Exception as e:
             self.logger.error(f"Failed to fetch article with UUID: {article_id}. Error: {e}")
+            return None
         
-        docs = [
-            {
-                "id": doc[0],
-                "page_content": doc[1],
-                "metadata": doc[2]
-            }
-            for doc in zip(docs['ids'], docs['documents'], docs['metadatas'])
-        ]
+        docs = self.to_articles(docs['ids'], docs['documents'], docs['metadatas'])
         
         if len(docs) == 1:
             return docs[0]
@@ -114,40 +290,61 @@ class RagDatabase:
     def get_missing_tags(self):
         try:
             docs = self.db.get(
-                where={"tags": '[]'}
+                where={"tag_count": 0}
             )
-            self.logger.info(f"Fetched {len(docs['ids'])} articles with missing tags. {docs}")
+            self.logger.info(f"Fetched {len(docs['ids'])} articles with missing tags.")
         except Exception as e:
             self.logger.error(f"Failed to fetch articles with missing tags: {e}")
-            docs = None
-            
-        docs = [
-            {
-                "id": doc[0],
-                "page_content": doc[1],
-                "metadata": doc[2]
-            }
-            for doc in zip(docs['ids'], docs['documents'], docs['metadatas'])
-        ]
+            return []
             
-        return result
+        return self.to_articles(docs['ids'], docs['documents'], docs['metadatas'])
     
     def update_metadata(self, id, metadata):
+        metadata, tags = self.prepare_metadata(metadata)
         # update metadata of the document
         try:
             self.db.update(
                 ids=[id],
                 metadatas=[metadata]
             )
+            self.tag_index.set_tags({id: tags})
             self.logger.info(f"Updated metadata for article with UUID: {id}")
         except Exception as e:
             self.logger.error(f"Failed to update metadata: {e}")
     
+    def migrate_tags(self, page_size=1000):
+        """
+        Convert stringified python tag lists to JSON, add tag_count and rebuild the tag index.
+        Safe to run again, already converted articles are rewritten with the same values.
+        """
+        self.logger.info("Migrating article tags to structured storage")
+        self.tag_index.clear()
+        
+        offset = 0
+        migrated = 0
+        while True:
+            docs = self.db.get(include=["metadatas"], limit=page_size, offset=offset)
+            if not docs["ids"]:
+                break
+            
+            prepared = [self.prepare_metadata(metadata or {}) for metadata in docs["metadatas"]]
+            self.db.update(ids=docs["ids"], metadatas=[metadata for metadata, _ in prepared])
+            self.tag_index.set_tags({article_id: tags for article_id, (_, tags) in zip(docs["ids"], prepared)})
+            
+            migrated += len(docs["ids"])
+            if len(docs["ids"]) < page_size:
+                break
+            offset += page_size
+        
+        self.tag_index.mark_migrated("structured_tags")
+        self.logger.info(f"Migrated tags of {migrated} articles")
+    
     def reset_database(self):
         # delete all news from db
         try:
             # drop table
             self.client.drop_collection(self.collection_name)
+            self.tag_index.clear()
             self.load_database()
         except Exception as e:
             self.logger.error(f"Failed to reset database: {e}")
@@ -156,9 +353,16 @@ class RagDatabase:
     
     def clear_old_news(self):
         # clear news with fetch_date older than 1 week from db
-        week_ago = int(datetime.now() - timedelta(days=7)).timestamp()
-        result = self.db.delete(where={"fetch_date": {"$lt": week_ago}})
-        self.logger.info(f"Deleted {result['n']} news older than 1 week.")
+        week_ago = int((datetime.now() - timedelta(days=7)).timestamp())
+        docs = self.db.get(where={"fetch_date": {"$lt": week_ago}}, include=["metadatas"])
+        if not docs["ids"]:
+            self.logger.info("No news older than 1 week.")
+            return
+        
+        self.db.delete(ids=docs["ids"])
+        self.remove_urls([metadata.get("url") for metadata in docs["metadatas"] if metadata])
+        self.tag_index.remove(docs["ids"])
+        self.logger.info(f"Deleted {len(docs['ids'])} news older than 1 week.")
         
     def show_db_summary(self):
         # Number of documents
@@ -174,33 +378,23 @@ class RagDatabase:
                     total_size += os.path.getsize(fp)
         total_size = total_size / (1024 * 1024)  # Convert to MB
         
+        cache_stats = self.query_cache.stats()
+        
         summary = (
             f"Database Summary:\n"
             f"- Number of Documents: {num_docs}\n"
-            f"- Database Size on Disk: {total_size:.2f} MB"
+            f"- Database Size on Disk: {total_size:.2f} MB\n"
+            f"- Query Embedding Cache: {cache_stats['size']}/{cache_stats['maxsize']} entries, "
+            f"{cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['hit_rate']:.1%} hit rate)"
         )
         print(summary)
         return summary
     
     def tags_summary(self):
         # get all tags and do some analysis
-        # get all documents
-        docs = self.db.get()
-
-        # get all tags
-        all_tags = []
-        for doc in docs['metadatas']:
-            # get the tags from the metadata
-            tags = ast.literal_eval(doc['tags'])
-            all_tags.extend(tags)
-        
-        # count the frequency of each tag
-        tag_counts = {}
-        for tag in all_tags:
-            if tag in tag_counts:
-                tag_counts[tag] += 1
-            else:
-                tag_counts[tag] = 1
+        # count the frequency of each tag from the tag index
+        tag_counts = self.tag_index.tag_counts()
+        total_occurences = self.tag_index.occurrence_count()
 
         # sort the tags by frequency
         sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)
@@ -210,8 +404,8 @@ class RagDatabase:
         print(f"Total number of unique tags: {len(sorted_tags)}")
         self.logger.info(f"Total number of unique tags: {len(sorted_tags)}")
         
-        print(f"Total number of tag occurences: {len(all_tags)}")
-        self.logger.info(f"Total number of tag occurences: {len(all_tags)}")
+        print(f"Total number of tag occurences: {total_occurences}")
+        self.logger.info(f"Total number of tag occurences: {total_occurences}")
         
         print(f"Average frequency of tags: {sum([count for _, count in sorted_tags]) / len(sorted_tags)}")
         self.logger.info(f"Average frequency of tags: {sum([count for _, count in sorted_tags]) / len(sorted_tags)}")
@@ -0,0 +1,180 @@
+""" ArticleTags.py
+Inverted index between articles and tags (tag -> article ids, article id -> tags).
+Persisted in SQLite and held in memory, so tag lookups do not go through Chroma metadata.
+Every change also bumps a snapshot version of the article collection in the same transaction,
+so processes sharing the database (the server, the DataFetcher CLI) can tell the articles changed.
+"""
+import threading
+
+from ..utils.Logger import setup_logger
+from .Storage import get_storage
+
+
+class ArticleTagIndex:
+    def __init__(self, database_path):
+        self.logger = setup_logger("articleTags", stream=False)
+
+        # per-thread connections in WAL mode, shared with the other tables of the file
+        self.db = get_storage(database_path)
+        self.lock = threading.Lock()
+
+        self.tags_by_article = {}
+        self.articles_by_tag = {}
+        # snapshot the memory index reflects, behind the persisted one after changes of other processes
+        self.loaded_snapshot = 0
+
+        self.create_table()
+        self.load()
+
+    def create_table(self):
+        with self.lock:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS article_tags (
+                    article_id TEXT,
+                    tag TEXT,
+                    position INTEGER,
+                    PRIMARY KEY (article_id, tag)
+                )
+            """)
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_article_tags_tag ON article_tags (tag)")
+            # records one-off migrations and the snapshot version of the article collection
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS article_tags_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            self.db.commit()
+
+    def load(self):
+        with self.lock:
+            self.loaded_snapshot = self.read_snapshot()
+            rows = self.db.execute("SELECT article_id, tag FROM article_tags ORDER BY article_id, position").fetchall()
+            self.tags_by_article = {}
+            self.articles_by_tag = {}
+            for article_id, tag in rows:
+                self.tags_by_article.setdefault(article_id, []).append(tag)
+                self.articles_by_tag.setdefault(tag, set()).add(article_id)
+        self.logger.info(f"Loaded tags of {len(self.tags_by_article)} articles")
+
+    def set_tags(self, article_tags):
+        """
+        Replace the tags of articles.
+        :param article_tags: dict of article id -> list of tags
+        """
+        if not article_tags:
+            return
+
+        with self.lock:
+            ids = list(article_tags.keys())
+            self.db.executemany("DELETE FROM article_tags WHERE article_id=?", [(article_id,) for article_id in ids])
+            self.db.executemany(
+                "INSERT OR IGNORE INTO article_tags (article_id, tag, position) VALUES (?, ?, ?)",
+                [(article_id, tag, i) for article_id, tags in article_tags.items() for i, tag in enumerate(tags)]
+            )
+            self.bump_snapshot()
+            self.db.commit()
+
+            for article_id, tags in article_tags.items():
+                self._remove_from_memory(article_id)
+                # drop repeated tags, keep their order
+                tags = list(dict.fromkeys(tags))
+                if tags:
+                    self.tags_by_article[article_id] = tags
+                for tag in tags:
+                    self.articles_by_tag.setdefault(tag, set()).add(article_id)
+
+    def _remove_from_memory(self, article_id):
+        # caller holds the lock
+        for tag in self.tags_by_article.pop(article_id, []):
+            article_ids = self.articles_by_tag.get(tag)
+            if article_ids is not None:
+                article_ids.discard(article_id)
+                if not article_ids:
+                    del self.articles_by_tag[tag]
+
+    def remove(self, article_ids):
+        with self.lock:
+            self.db.executemany("DELETE FROM article_tags WHERE article_id=?", [(article_id,) for article_id in article_ids])
+            self.bump_snapshot()
+            self.db.commit()
+            for article_id in article_ids:
+                self._remove_from_memory(article_id)
+
+    def get_tags(self, article_id):
+        with self.lock:
+            tags = self.tags_by_article.get(article_id)
+            if tags is None:
+                # articles inserted by another process (e.g. the DataFetcher CLI) after load
+                tags = [row[0] for row in self.db.execute("SELECT tag FROM article_tags WHERE article_id=? ORDER BY position", (article_id,)).fetchall()]
+                # articles without tags are cached too, so they are looked up once
+                self.tags_by_article[article_id] = tags
+                for tag in tags:
+                    self.articles_by_tag.setdefault(tag, set()).add(article_id)
+            return list(tags)
+
+    # ids of articles having any of the tags
+    def get_articles(self, tags):
+        with self.lock:
+            article_ids = set()
+            for tag in tags:
+                article_ids |= self.articles_by_tag.get(tag, set())
+            return article_ids
+
+    def tag_counts(self):
+        with self.lock:
+            return {tag: len(article_ids) for tag, article_ids in self.articles_by_tag.items()}
+
+    def occurrence_count(self):
+        with self.lock:
+            return sum(len(tags) for tags in self.tags_by_article.values())
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM article_tags")
+            self.bump_snapshot()
+            self.db.commit()
+            self.tags_by_article = {}
+            self.articles_by_tag = {}
+
+    def is_migrated(self, name):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM article_tags_meta WHERE key=?", (name,)).fetchone() is not None
+
+    def mark_migrated(self, name):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO article_tags_meta (key, value) VALUES (?, 'done')", (name,))
+            self.db.commit()
+
+    def read_snapshot(self):
+        # caller holds the lock
+        row = self.db.execute("SELECT value FROM article_tags_meta WHERE key='snapshot'").fetchone()
+        return int(row[0]) if row else 0
+
+    def bump_snapshot(self):
+        # caller holds the lock and commits, runs in the write transaction of the change
+        snapshot = self.read_snapshot()
+        self.db.execute("INSERT OR REPLACE INTO article_tags_meta (key, value) VALUES ('snapshot', ?)", (str(snapshot + 1),))
+        # the memory index stays current unless another process changed the articles before
+        if snapshot == self.loaded_snapshot:
+            self.loaded_snapshot = snapshot + 1
+        return snapshot + 1
+
+    def snapshot(self):
+        """
+        :return: version of the article collection, changed by inserts, updates and deletes of any process
+        """
+        with self.lock:
+            return self.read_snapshot()
+
+    def sync(self):
+        """
+        Reload the memory index if another process (e.g. the DataFetcher CLI) changed the articles.
+        :return: True if it was reloaded
+        """
+        with self.lock:
+            if self.read_snapshot() == self.loaded_snapshot:
+                return False
+        self.logger.info("Articles changed by another process, reloading tags")
+        self.load()
+        return True
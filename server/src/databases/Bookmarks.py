@@ -1,27 +1,38 @@
 import os
-import ast
 import json
 import uuid
-import sqlite3
+import threading
+from cachetools import LRUCache
 
+from .Storage import get_storage
 from ..utils.Logger import setup_logger
+from ..utils.Tags import parse_tags, serialize_tags
 
 class BookmarkDatabase:
-    def __init__(self, rag_database=None):
-        self.conn = sqlite3.connect("../../database/NewsAgent.db")
-        self.cursor = self.conn.cursor()
+    def __init__(self, rag_database=None, cache_status=False, cache_workspaces=1024):
+        """
+        :param cache_status: remember the bookmark status of articles per workspace, kept up to date by add and delete
+        :param cache_workspaces: workspaces whose statuses are kept, least recently used dropped first
+        """
+        # per-thread connections, requests do not share a cursor
+        self.db = get_storage()
         if rag_database:
             self.rag_database = rag_database
         
         self.logger = setup_logger("bookmark")
         
+        # (user_id, workspace_id) -> {article_id: bookmarked}, only articles that were looked up
+        self.status_cache = LRUCache(maxsize=cache_workspaces) if cache_status else None
+        self.status_lock = threading.Lock()
+        
         # create table if not exists bookmarks
         if not self.table_exists("bookmarks"):
             self.create_table()
+        self.create_indexes()
         
     def create_table(self):
         # id, title, summary, url, tags, fetch_date
-        self.cursor.execute("""
+        self.db.execute("""
                 CREATE TABLE bookmarks (
                     bookmark_id TEXT PRIMARY KEY,
                     article_id TEXT,
@@ -35,24 +46,29 @@ class BookmarkDatabase:
                     workspace_id TEXT
                 )
             """)
-        self.conn.commit()
+        self.db.commit()
         self.logger.info("Created bookmarks table in the database")
+    
+    def create_indexes(self):
+        # lookups are always scoped to a workspace, and by article when adding or removing a bookmark
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_bookmarks_workspace ON bookmarks (user_id, workspace_id)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS idx_bookmarks_article ON bookmarks (article_id, user_id, workspace_id)")
+        self.db.commit()
         
     def table_exists(self, table_name):
         try:
-            result = self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
+            result = self.db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
             if result.fetchone():
                 return True
             else:
                 return False
         except Exception as e:
-            data_logger.error(f"Failed to check if table exists: {e}")
+            self.logger.error(f"Failed to check if table exists: {e}")
             return False
 
     def get_all_bookmarks(self, user_id, workspace_id):
         # get all bookmarks
-        self.cursor.execute("SELECT * FROM bookmarks WHERE user_id=? AND workspace_id=?", (user_id, workspace_id))
-        rows = self.cursor.fetchall()
+        rows = self.db.execute("SELECT * FROM bookmarks WHERE user_id=? AND workspace_id=?", (user_id, workspace_id)).fetchall()
         
         self.logger.info(f"Fetched all bookmarks for user {user_id} in workspace {workspace_id}: {rows}")
         
@@ -66,7 +82,7 @@ class BookmarkDatabase:
                 "metadata": {
                     "title": row[2],
                     "url": row[4],
-                    "tags": ast.literal_eval(row[5]) if row[5] else [],  # convert string to list
+                    "tags": parse_tags(row[5]),  # convert string to list
                     "fetch_date": row[6]
                 },
                 "note": row[7] if row[7] else ""
@@ -77,10 +93,9 @@ class BookmarkDatabase:
 
     def get_all_bookmark_ids(self):
         # get all bookmarks
-        self.cursor.execute("SELECT bookmark_id FROM bookmarks")
-        rows = self.cursor.fetchall()
+        rows = self.db.execute("SELECT bookmark_id FROM bookmarks").fetchall()
         
-        self.logger.info(f"Fetched all ids of bookmarks: {rows}")
+        self.logger.info(f"Fetched {len(rows)} ids of bookmarks")
         
         ids = [row[0] for row in rows]
         
@@ -88,27 +103,66 @@ class BookmarkDatabase:
     
     def get_all_article_ids(self, user_id, workspace_id):
         # get all article ids
-        self.cursor.execute("SELECT article_id FROM bookmarks WHERE user_id=? AND workspace_id=?", (user_id, workspace_id,))
-        rows = self.cursor.fetchall()
+        rows = self.db.execute("SELECT article_id FROM bookmarks WHERE user_id=? AND workspace_id=?", (user_id, workspace_id,)).fetchall()
         
-        self.logger.info(f"Fetched all ids of articles in bookmarks for workspace {workspace_id}: {rows}")
+        self.logger.info(f"Fetched {len(rows)} ids of articles in bookmarks for workspace {workspace_id}")
         
         ids = [row[0] for row in rows]
         
         return ids
     
+    # which of the given articles are bookmarked, one indexed lookup instead of loading the whole workspace
+    def get_bookmarked_article_ids(self, article_ids, user_id, workspace_id, chunk_size=500):
+        article_ids = list(set(article_ids))
+        bookmarked = set()
+        # stay below sqlite's limit of bound variables
+        for start in range(0, len(article_ids), chunk_size):
+            chunk = article_ids[start:start + chunk_size]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.db.execute(
+                f"SELECT article_id FROM bookmarks WHERE article_id IN ({placeholders}) AND user_id=? AND workspace_id=?",
+                (*chunk, user_id, workspace_id)
+            ).fetchall()
+            bookmarked.update(row[0] for row in rows)
+        return bookmarked
+    
+    def get_bookmark_statuses(self, article_ids, user_id, workspace_id):
+        if self.status_cache is None:
+            bookmarked = self.get_bookmarked_article_ids(article_ids, user_id, workspace_id)
+            return {article_id: article_id in bookmarked for article_id in article_ids}
+        
+        key = (user_id, workspace_id)
+        with self.status_lock:
+            statuses = self.status_cache.get(key)
+            if statuses is None:
+                statuses = self.status_cache[key] = {}
+            missing = [article_id for article_id in article_ids if article_id not in statuses]
+        
+        if missing:
+            bookmarked = self.get_bookmarked_article_ids(missing, user_id, workspace_id)
+            with self.status_lock:
+                # keep statuses an add or delete set while the lookup ran
+                for article_id in missing:
+                    statuses.setdefault(article_id, article_id in bookmarked)
+        
+        return {article_id: statuses[article_id] for article_id in article_ids}
+    
+    def set_cached_status(self, user_id, workspace_id, article_id, bookmarked):
+        if self.status_cache is None:
+            return
+        with self.status_lock:
+            statuses = self.status_cache.get((user_id, workspace_id))
+            if statuses is not None:
+                statuses[article_id] = bookmarked
+    
     # add bookmark status to articles
     def add_bookmark_status(self, articles, user_id, workspace_id):
-        # get all bookmark ids
-        bookmarked_article_ids = self.get_all_article_ids(user_id, workspace_id)
+        statuses = self.get_bookmark_statuses([article["id"] for article in articles], user_id, workspace_id)
         
-        self.logger.info(f"Querying article ids {[article['id'] for article in articles]} for user {user_id} in workspace {workspace_id}")
+        self.logger.info(f"Looked up bookmark status of {len(articles)} articles for user {user_id} in workspace {workspace_id}")
         
         for article in articles:
-            if article["id"] in bookmarked_article_ids:
-                article["bookmarked"] = True
-            else:
-                article["bookmarked"] = False
+            article["bookmarked"] = statuses[article["id"]]
                 
         return articles
         
@@ -125,18 +179,17 @@ class BookmarkDatabase:
             return False
 
         # check if the article already exists in the bookmarks
-        self.cursor.execute("SELECT * FROM bookmarks WHERE article_id=? AND user_id=? AND workspace_id=?", (article_id, user_id, workspace_id))
+        existing = self.db.execute("SELECT 1 FROM bookmarks WHERE article_id=? AND user_id=? AND workspace_id=?", (article_id, user_id, workspace_id)).fetchone()
 
-        if self.cursor.fetchone():
+        if existing:
             self.logger.info(f"Article with ID {article_id} already exists in the bookmarks.")
             return False
         
 
         # insert the article into the bookmarks table
-        if not article["metadata"]["tags"]:
-            article["metadata"]["tags"] = []
+        tags = serialize_tags(article["metadata"]["tags"] or [])
             
-        self.cursor.execute(f"""
+        self.db.execute(f"""
             INSERT INTO bookmarks (bookmark_id, article_id, title, summary, url, tags, fetch_date, note, user_id, workspace_id)
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
         """, (
@@ -145,50 +198,62 @@ class BookmarkDatabase:
             article["metadata"]["title"],
             article["page_content"],
             article["metadata"]["url"],
-            article["metadata"]["tags"],
+            tags,
             article["metadata"]["fetch_date"],
             "",
             user_id,
             workspace_id,
         ))
         
-        self.conn.commit()
+        self.db.commit()
+        self.set_cached_status(user_id, workspace_id, article_id, True)
         self.logger.info(f"Added bookmark for article with ID: {article_id} for user {user_id} in workspace {workspace_id}")
         return True
         
 
     def delete_bookmark(self, bookmark_id):
         # delete bookmark
-        self.cursor.execute("DELETE FROM bookmarks WHERE bookmark_id=?", (bookmark_id,))
-        self.conn.commit()
+        row = self.db.execute("SELECT article_id, user_id, workspace_id FROM bookmarks WHERE bookmark_id=?", (bookmark_id,)).fetchone()
+        self.db.execute("DELETE FROM bookmarks WHERE bookmark_id=?", (bookmark_id,))
+        self.db.commit()
+        if row:
+            article_id, user_id, workspace_id = row
+            self.set_cached_status(user_id, workspace_id, article_id, False)
         self.logger.info(f"Deleted bookmark {bookmark_id}")
         return True
     
     def delete_bookmark_by_article(self, article_id, user_id, workspace_id):
         # delete bookmark by article id
-        self.cursor.execute("DELETE FROM bookmarks WHERE article_id=? AND user_id=? AND workspace_id=?", (article_id, user_id, workspace_id))
-        self.conn.commit()
+        self.db.execute("DELETE FROM bookmarks WHERE article_id=? AND user_id=? AND workspace_id=?", (article_id, user_id, workspace_id))
+        self.db.commit()
+        self.set_cached_status(user_id, workspace_id, article_id, False)
         self.logger.info(f"Deleted bookmark for article {article_id} for user {user_id} in workspace {workspace_id}")
         return True
     
     def delete_all_bookmarks(self, user_id, workspace_id):
         # delete all bookmarks for a user
-        self.cursor.execute("DELETE FROM bookmarks WHERE user_id=? AND workspace_id=?", (user_id, workspace_id))
-        self.conn.commit()
+        self.db.execute("DELETE FROM bookmarks WHERE user_id=? AND workspace_id=?", (user_id, workspace_id))
+        self.db.commit()
+        if self.status_cache is not None:
+            with self.status_lock:
+                self.status_cache.pop((user_id, workspace_id), None)
         self.logger.info(f"Deleted all bookmarks for user {user_id} in workspace {workspace_id}")
         return True
     
     def reset_database(self):
         # delete table and recreate it
-        self.cursor.execute("DROP TABLE IF EXISTS bookmarks")
-        self.conn.commit()
+        self.db.execute("DROP TABLE IF EXISTS bookmarks")
+        self.db.commit()
         self.create_table()
+        self.create_indexes()
+        if self.status_cache is not None:
+            with self.status_lock:
+                self.status_cache.clear()
         self.logger.info("Reset bookmarks database")
         
     def print_all_bookmarks(self):
         # print all bookmarks
-        self.cursor.execute("SELECT * FROM bookmarks")
-        rows = self.cursor.fetchall()
+        rows = self.db.execute("SELECT * FROM bookmarks").fetchall()
         for row in rows:
             print(row)
     
@@ -0,0 +1,67 @@
+""" ChromaRegistry.py
+Process-wide registry of Chroma clients and embedding functions.
+RagDatabase and InterestDatabase share the same client per directory and the same
+embedding model, which is only loaded on the first encode.
+"""
+import os
+import threading
+import chromadb
+from chromadb.config import Settings
+from chromadb.api.types import EmbeddingFunction
+from chromadb.utils import embedding_functions
+
+from ..utils.Logger import setup_logger
+
+logger = setup_logger("chroma", stream=False)
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-mpnet-base-v2"
+
+_clients = {}
+_embedding_functions = {}
+_registry_lock = threading.Lock()
+
+
+class LazyEmbeddingFunction(EmbeddingFunction):
+    def __init__(self, model_name, device="cpu"):
+        self.model_name = model_name
+        self.device = device
+        self.function = None
+        self.load_lock = threading.Lock()
+
+    def is_loaded(self):
+        return self.function is not None
+
+    def load(self):
+        if self.function is None:
+            with self.load_lock:
+                if self.function is None:
+                    logger.info(f"Loading embedding model {self.model_name} on {self.device}")
+                    self.function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name=self.model_name,
+                        device=self.device
+                    )
+        return self.function
+
+    def __call__(self, input):
+        return self.load()(input)
+
+
+def get_client(database_dir):
+    path = os.path.abspath(database_dir)
+    with _registry_lock:
+        if path not in _clients:
+            _clients[path] = chromadb.PersistentClient(path=path, settings=Settings(allow_reset=True))
+            logger.info(f"Created Chroma client for {path}")
+        return _clients[path]
+
+
+# note: collections keep the dimension of the model they were created with,
+# so switching model_name requires a fresh database directory
+def get_embedding_function(model_name=None, device=None):
+    model_name = model_name if model_name else DEFAULT_MODEL_NAME
+    device = device if device else os.getenv("DEVICE", "cpu")
+    with _registry_lock:
+        key = (model_name, device)
+        if key not in _embedding_functions:
+            _embedding_functions[key] = LazyEmbeddingFunction(model_name, device)
+        return _embedding_functions[key]
@@ -2,75 +2,90 @@
     UserProfile class to manage tag-based user profiles.
 """
 import os
-import ast
 import uuid
-import chromadb
-from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+import numpy as np
 
+from .ChromaRegistry import get_client, get_embedding_function
+from .InterestStore import InterestStore
 from ..utils.Logger import setup_logger
+from ..utils.ServerConfig import ServerConfig
 
 
 class InterestDatabase:
-    def __init__(self, config=None, rag_db=None):
-        self.config = config
+    def __init__(self, config=None, rag_db=None, digest_cache=None):
+        self.config = config if config else ServerConfig()
         self.rag_db = rag_db
+        # daily digests depend on the interest profile
+        self.digest_cache = digest_cache
         
         self.logger = setup_logger("interest", stream=False)
         
         # load database
         self.collection_name = "user_interests"
+        self.tag_collection_name = "interest_tags"
         
         cur_path = os.path.dirname(os.path.abspath(__file__))
         self.database_dir = f"{cur_path}/../../database/NewsAgentChroma"
         
-        self.embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="sentence-transformers/all-mpnet-base-v2"
+        # tag scores keyed by (workspace_id, tag), decayed per day since their last update and capped
+        self.store = InterestStore(
+            f"{cur_path}/../../database/NewsAgent.db",
+            time_scaling_factor=self.config.tags["time_scaling_factor"],
+            max_score=self.config.tags["max_tag_score"],
+            top_k=self.config.tags["top_k"]
         )
         
-        self.client = chromadb.PersistentClient(path=self.database_dir, settings=Settings(allow_reset=True))
+        # shared with other databases, model is loaded on first encode
+        self.embedding_function = get_embedding_function(self.config.embedding["model_name"])
+        self.client = get_client(self.database_dir)
         
+        # legacy profile collection, only read to migrate scores into the store
         self.db = self.client.get_or_create_collection(
             name=self.collection_name, 
             embedding_function=self.embedding_function
         )
         
+        # one embedding per distinct tag, only filled when similar tags are requested
+        self.tag_db = self.client.get_or_create_collection(
+            name=self.tag_collection_name, 
+            embedding_function=self.embedding_function
+        )
+        
+        # migrated once, an empty store after resetting every workspace must not import the old scores again
+        if not self.store.is_migrated("chroma_profiles"):
+            # stores filled before the marker existed were migrated already
+            if self.store.is_empty():
+                self.migrate_from_chroma()
+            self.store.mark_migrated("chroma_profiles")
+    
+    def migrate_from_chroma(self):
+        result = self.db.get(include=["metadatas"])
+        if not result["ids"]:
+            return
+        
+        # sum duplicated rows of the same tag in a workspace
+        deltas = {}
+        for metadata in result["metadatas"]:
+            if not metadata or "workspace_id" not in metadata:
+                continue
+            key = (metadata.get("user_id"), metadata["workspace_id"])
+            workspace_deltas = deltas.setdefault(key, {})
+            workspace_deltas[metadata["tag"]] = workspace_deltas.get(metadata["tag"], 0) + metadata["score"]
+        
+        for (user_id, workspace_id), workspace_deltas in deltas.items():
+            self.store.upsert_scores(user_id, workspace_id, workspace_deltas)
+        
+        self.logger.info(f"Migrated {len(result['ids'])} tag scores of {len(deltas)} workspaces from chroma")
+    
     def add_score(self, tag, score, user_id, workspace_id):
-        # check if tag exists in the database
-            result = self.db.get(
-                where={"$and": [ {"tag": tag}, {"workspace_id": workspace_id}]}
-            )
-            
-            self.logger.info(f"Retrieved result {result} for tag {tag}")
-            
-            # insert new tag
-            if len(result["documents"]) == 0:
-                metadata = {
-                    "user_id": user_id,
-                    "workspace_id": workspace_id,
-                    "tag": tag,
-                    "score": score
-                }
-                self.db.add(
-                    documents=[tag],
-                    metadatas=[metadata],
-                    ids=[str(uuid.uuid4())]
-                )
-                self.logger.info(f"Inserted new tag {tag} with metadata {metadata}")
-                
-            # get score and add score based on config
-            else:
-                metadata = result["metadatas"][0]
-                
-                metadata["score"] += score
-                
-                self.db.update(
-                    ids=[result["ids"][0]],
-                    metadatas=[metadata]
-                ) 
-                
-                self.logger.info(f"Updated tag {tag} with metadata {metadata}")
-                
+        self.add_scores({tag: score}, user_id, workspace_id)
+    
+    # apply all score changes of one interaction as a single upsert
+    def add_scores(self, deltas, user_id, workspace_id):
+        self.store.upsert_scores(user_id, workspace_id, deltas)
+        
+        if self.digest_cache:
+            self.digest_cache.invalidate_workspace(workspace_id)
     
     def interact_with_article(self, article_id,  user_id, workspace_id, interaction="click",):
         if interaction not in ["click", "bookmark"]:
@@ -79,42 +94,79 @@ class InterestDatabase:
         article = self.rag_db.get_article_by_id(article_id)
         
         # if article does not exist or contains no tags, return
-        if article is None or article["metadata"]["tags"] is None:
+        if article is None or not article["metadata"]["tags"]:
             self.logger.info(f"Article {article_id} has no tags")
             return
         
-        tags = ast.literal_eval(article["metadata"]["tags"])
+        tags = article["metadata"]["tags"]
         self.logger.info(f"Clicked tags: {tags}")
         
-        # update each tag
+        # update all tags at once
         base_score = self.config.tags[f"{interaction}_score"]
+        deltas = {}
         for tag in tags:
-            self.add_score(
-                tag,
-                base_score,
-                user_id,
-                workspace_id
-            )
+            deltas[tag] = deltas.get(tag, 0) + base_score
             
             # TODO: this is extremely slow, we need to optimize this
             '''similar_tags = self.get_similar_tags(tag)
             
             for similar_tag in similar_tags["documents"][0]:
-                self.add_score(
-                    similar_tag,
-                    base_score * self.config.tags["similar_tag_weight"],
-                    user_id,
-                    workspace_id
-                )
+                deltas[similar_tag] = deltas.get(similar_tag, 0) + base_score * self.config.tags["similar_tag_weight"]
                 '''
+        
+        self.add_scores(deltas, user_id, workspace_id)
+    
+    # apply many interactions at once, e.g. flushed from the interaction buffer
+    # events are (article_id, user_id, workspace_id, interaction) tuples
+    def interact_with_articles(self, events):
+        deltas = {}
+        for article_id, user_id, workspace_id, interaction in events:
+            # tags are held by the tag index, so no chroma lookup per event
+            tags = self.rag_db.tag_index.get_tags(article_id)
+            if not tags:
+                # e.g. an article without index rows, read the tags stored with it
+                article = self.rag_db.get_article_by_id(article_id)
+                tags = article["metadata"]["tags"] if article else []
+            if not tags:
+                # the event was already acknowledged to the client
+                self.logger.warning(f"Dropping {interaction} of workspace {workspace_id}: article {article_id} {'has no tags' if article else 'not found'}")
+                continue
+            
+            # repeated (workspace, tag) pairs merge into one delta
+            base_score = self.config.tags[f"{interaction}_score"]
+            workspace_deltas = deltas.setdefault((user_id, workspace_id), {})
+            for tag in tags:
+                workspace_deltas[tag] = workspace_deltas.get(tag, 0) + base_score
+        
+        for (user_id, workspace_id), workspace_deltas in deltas.items():
+            self.add_scores(workspace_deltas, user_id, workspace_id)
+        
+        self.logger.info(f"Applied {len(events)} interactions to {len(deltas)} workspaces")
+        return deltas
+    
+    # embed tags that are not in the tag collection yet
+    def index_tags(self, tags):
+        ids = [str(uuid.uuid3(uuid.NAMESPACE_DNS, tag)) for tag in tags]
+        existing_ids = set(self.tag_db.get(ids=ids, include=[])["ids"])
+        
+        new_tags = [(tag_id, tag) for tag_id, tag in zip(ids, tags) if tag_id not in existing_ids]
+        if new_tags:
+            self.tag_db.add(
+                ids=[tag_id for tag_id, _ in new_tags],
+                documents=[tag for _, tag in new_tags]
+            )
+            self.logger.info(f"Indexed {len(new_tags)} new tags")
     
     # add some score to similar tags
     def get_similar_tags(self, tag, result_count=5):
+        # tag embeddings are only computed here, when similarity is actually needed
+        self.index_tags(list(set(self.store.get_all_tags()) | {tag}))
+        
         # retrieve 20 similar tags
         # here we are only caring the sementic similarity of the tags, the associated users or workspace are not important
-        similar_tags = self.db.query(
+        similar_tags = self.tag_db.query(
             query_texts=[tag],
-            n_results=20
+            n_results=min(20, self.tag_db.count())
         )
         
         self.logger.info(f"Similar tags for {tag}: {similar_tags}")
@@ -122,74 +174,59 @@ class InterestDatabase:
         return similar_tags
     
     def get_tag_score(self, tag):
-        result = self.db.get(
-            where={"tag": tag}
-        )
         # get tag score
-        if len(result["documents"]) == 0:
-            # self.logger.info(f"Tag {tag} not found")
-            return 0
-        else:
-            tag_score = result["metadatas"][0]["score"]
-            self.logger.info(f"Tag {tag} score: {tag_score}")
-            return tag_score
+        tag_score = self.store.get_score(tag)
+        self.logger.info(f"Tag {tag} score: {tag_score}")
+        return tag_score
+    
+    # scores of many tags in one lookup, in the same order as tags
+    def get_tag_scores(self, tags, workspace_id=None):
+        if not workspace_id:
+            return np.array([self.store.get_score(tag) for tag in tags], dtype=float)
+        
+        scores = self.store.get_scores(workspace_id, tags=set(tags))
+        return np.array([scores.get(tag, 0) for tag in tags], dtype=float)
     
     def get_top_tags(self, user_id, workspace_id, tag_count=10):
         # get top tags from the user profile
         self.logger.info(f"Fetching top tags for workspace {workspace_id}")
 
-        # get all tags
+        # the store keeps the top tags of each workspace, no sort of all tags needed
         if workspace_id:
-            result = self.db.get(
-                where={"workspace_id": workspace_id}
-            )
+            top_tags = [tag for tag, _ in self.store.get_top_tags(workspace_id, tag_count)]
         else:
-            result = self.db.get()
-            
-        all_tags = []
-        for doc in result["metadatas"]:
-            all_tags.append( (doc["tag"], doc["score"]) )
-        # sort tags by score
-        all_tags.sort(key=lambda x: x[1], reverse=True)
-        
-        # get top tags
-        top_tags = [tag[0] for tag in all_tags[:tag_count]]
+            all_tags = [(tag, score) for _, tag, score in self.store.get_all_scores()]
+            all_tags.sort(key=lambda x: x[1], reverse=True)
+            top_tags = [tag[0] for tag in all_tags[:tag_count]]
         
         self.logger.info(f"Fetched top tags: {top_tags}")
         return top_tags
     
     def reset_workspace_profile(self, workspace_id):
-        self.db.delete(
-            where={"workspace_id": workspace_id}
-        )
-    
-    
-    def clean_database(self):
-        result = self.db.get()
-        metadatas = result["metadatas"]
-        
-        # change all profile_id to workspace_id
-        for metadata in metadatas:
-            metadata["workspace_id"] = SPACE_ID
-            del metadata["profile_id"]
-            
-        self.db.update(
-            ids=result["ids"],
-            metadatas=metadatas
-        )
-        self.logger.info("Database updated")
+        self.store.delete_workspace(workspace_id)
+        if self.digest_cache:
+            self.digest_cache.invalidate_workspace(workspace_id)
     
     # clear entire database
     def clear_database(self):
+        self.store.clear()
+        
         self.client.delete_collection(self.collection_name)
+        self.client.delete_collection(self.tag_collection_name)
         
         self.db = self.client.get_or_create_collection(
             name=self.collection_name, 
             embedding_function=self.embedding_function
         )
+        self.tag_db = self.client.get_or_create_collection(
+            name=self.tag_collection_name, 
+            embedding_function=self.embedding_function
+        )
+        
+        if self.digest_cache:
+            self.digest_cache.invalidate_all()
         
         self.logger.info("Database cleared")
             
 if __name__ == "__main__":
     interest_db = InterestDatabase()
-    # interest_db.clean_database()
\ No newline at end of file
@@ -0,0 +1,241 @@
+""" InterestStore.py
+Tag scores of workspaces, keyed by (workspace_id, tag).
+Scores are persisted in SQLite and mirrored in memory per workspace, so reads never
+touch the database after the first access and each interaction is one upsert.
+A score decays by time_scaling_factor per day since it was last updated. Decay is applied
+when a score is read or updated, from its stored timestamp, so no periodic rewrite is needed.
+"""
+import time
+import heapq
+import threading
+
+from ..utils.Logger import setup_logger
+from .Storage import get_storage
+
+DAY_SECONDS = 86400
+
+
+class TopTags:
+    """
+    Highest scored tags of a workspace, keyed by their score decayed to reference_time.
+    Every score decays by the same factor, so this order equals the order of the current
+    scores at any later time and the structure only changes when scores are updated.
+    """
+    def __init__(self, reference_time, keys):
+        self.reference_time = reference_time
+        # tag -> score at reference_time
+        self.keys = keys
+        # set when a tag of the top may have fallen below a tag outside of it
+        self.dirty = False
+
+
+class InterestStore:
+    def __init__(self, database_path, time_scaling_factor=1.0, max_score=None, top_k=20):
+        """
+        :param time_scaling_factor: factor applied to a score per day since its last update
+        :param max_score: upper bound of a score, None for unbounded
+        :param top_k: size of the per-workspace top tags, larger top tag requests sort all tags
+        """
+        self.logger = setup_logger("interestStore", stream=False)
+        self.time_scaling_factor = time_scaling_factor
+        self.max_score = max_score
+        self.top_k = top_k
+
+        # per-thread connections in WAL mode, shared with the other tables of the file
+        self.db = get_storage(database_path)
+        self.lock = threading.Lock()
+
+        # workspace_id -> {tag: (score, updated_at)}, filled on first access of a workspace
+        self.cache = {}
+        # workspace_id -> TopTags, built on the first top tags request of a workspace
+        self.top_tags = {}
+
+        self.create_table()
+
+    def create_table(self):
+        with self.lock:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS interests (
+                    workspace_id TEXT,
+                    tag TEXT,
+                    user_id TEXT,
+                    score REAL,
+                    updated_at REAL,
+                    PRIMARY KEY (workspace_id, tag)
+                )
+            """)
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_interests_tag ON interests (tag)")
+            # records one-off migrations of the interest profiles
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS interests_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+
+            # tables created before decay have no timestamps, their scores start decaying now
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(interests)").fetchall()]
+            if "updated_at" not in columns:
+                self.db.execute("ALTER TABLE interests ADD COLUMN updated_at REAL")
+                self.db.execute("UPDATE interests SET updated_at=?", (time.time(),))
+                if self.max_score is not None:
+                    self.db.execute("UPDATE interests SET score=MIN(score, ?)", (self.max_score,))
+                self.logger.info("Added updated_at to interests")
+            self.db.commit()
+
+    '''
+    Decay
+    '''
+    def decay(self, score, updated_at, now):
+        # score at now, updates after now (e.g. top tags keys) grow by the inverse factor
+        return score * self.time_scaling_factor ** ((now - updated_at) / DAY_SECONDS)
+
+    def cap(self, score):
+        return min(score, self.max_score) if self.max_score is not None else score
+
+    '''
+    Scores
+    '''
+    def is_empty(self):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM interests LIMIT 1").fetchone() is None
+
+    def is_migrated(self, name):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM interests_meta WHERE key=?", (name,)).fetchone() is not None
+
+    def mark_migrated(self, name):
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO interests_meta (key, value) VALUES (?, 'done')", (name,))
+            self.db.commit()
+
+    def load_workspace(self, workspace_id):
+        # caller holds the lock
+        if workspace_id not in self.cache:
+            rows = self.db.execute("SELECT tag, score, updated_at FROM interests WHERE workspace_id=?", (workspace_id,)).fetchall()
+            self.cache[workspace_id] = {tag: (score, updated_at) for tag, score, updated_at in rows}
+        return self.cache[workspace_id]
+
+    def upsert_scores(self, user_id, workspace_id, deltas):
+        """
+        Add score deltas to tags of a workspace in one transaction.
+        Each tag's score is decayed to now before its delta is added, then capped at max_score.
+        :param deltas: dict of tag -> score to add
+        """
+        if not deltas:
+            return
+
+        now = time.time()
+        with self.lock:
+            scores = self.load_workspace(workspace_id)
+
+            updated = {}
+            for tag, delta in deltas.items():
+                score, updated_at = scores.get(tag, (0, now))
+                updated[tag] = (self.cap(self.decay(score, updated_at, now) + delta), now)
+
+            self.db.executemany("""
+                INSERT INTO interests (workspace_id, tag, user_id, score, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (workspace_id, tag) DO UPDATE SET score=excluded.score, updated_at=excluded.updated_at
+            """, [(workspace_id, tag, user_id, score, updated_at) for tag, (score, updated_at) in updated.items()])
+            self.db.commit()
+
+            scores.update(updated)
+            self.update_top_tags(workspace_id, updated)
+
+        self.logger.info(f"Updated {len(deltas)} tags of workspace {workspace_id}: {deltas}")
+
+    def get_scores(self, workspace_id, tags=None):
+        """
+        :param tags: tags to look up, None for every tag of the workspace
+        :return: dict of tag -> current score, tags without a score are left out
+        """
+        now = time.time()
+        with self.lock:
+            scores = self.load_workspace(workspace_id)
+            if tags is None:
+                tags = scores.keys()
+            return {tag: self.decay(*scores[tag], now) for tag in tags if tag in scores}
+
+    # score of a tag in any workspace
+    def get_score(self, tag):
+        with self.lock:
+            row = self.db.execute("SELECT score, updated_at FROM interests WHERE tag=? LIMIT 1", (tag,)).fetchone()
+        return self.decay(row[0], row[1], time.time()) if row else 0
+
+    def get_all_scores(self):
+        now = time.time()
+        with self.lock:
+            rows = self.db.execute("SELECT workspace_id, tag, score, updated_at FROM interests").fetchall()
+        return [(workspace_id, tag, self.decay(score, updated_at, now)) for workspace_id, tag, score, updated_at in rows]
+
+    def get_all_tags(self):
+        with self.lock:
+            return [row[0] for row in self.db.execute("SELECT DISTINCT tag FROM interests").fetchall()]
+
+    '''
+    Top tags
+    '''
+    def build_top_tags(self, workspace_id):
+        # caller holds the lock
+        now = time.time()
+        scores = self.load_workspace(workspace_id)
+        top = heapq.nlargest(self.top_k, ((self.decay(score, updated_at, now), tag) for tag, (score, updated_at) in scores.items()))
+        self.top_tags[workspace_id] = TopTags(now, {tag: key for key, tag in top})
+        return self.top_tags[workspace_id]
+
+    def update_top_tags(self, workspace_id, updated):
+        # caller holds the lock, updated is {tag: (score, updated_at)} of changed tags
+        top = self.top_tags.get(workspace_id)
+        if top is None or top.dirty:
+            return
+
+        for tag, (score, updated_at) in updated.items():
+            key = self.decay(score, updated_at, top.reference_time)
+            if tag in top.keys:
+                if key < top.keys[tag]:
+                    # a tag outside the top may rank higher now, rebuild on the next read
+                    top.dirty = True
+                    return
+                top.keys[tag] = key
+            elif len(top.keys) < self.top_k:
+                # the top holds every tag of the workspace until it is full
+                top.keys[tag] = key
+            else:
+                lowest = min(top.keys, key=top.keys.get)
+                if key > top.keys[lowest]:
+                    del top.keys[lowest]
+                    top.keys[tag] = key
+
+    def get_top_tags(self, workspace_id, count=10):
+        """
+        :return: list of (tag, current score) of the count highest scored tags
+        """
+        now = time.time()
+        with self.lock:
+            if count > self.top_k:
+                scores = self.load_workspace(workspace_id)
+                top = heapq.nlargest(count, ((self.decay(score, updated_at, now), tag) for tag, (score, updated_at) in scores.items()))
+                return [(tag, score) for score, tag in top]
+
+            top = self.top_tags.get(workspace_id)
+            if top is None or top.dirty:
+                top = self.build_top_tags(workspace_id)
+
+            tags = sorted(top.keys, key=top.keys.get, reverse=True)[:count]
+            scores = self.cache[workspace_id]
+            return [(tag, self.decay(*scores[tag], now)) for tag in tags]
+
+    def delete_workspace(self, workspace_id):
+        with self.lock:
+            self.db.execute("DELETE FROM interests WHERE workspace_id=?", (workspace_id,))
+            self.db.commit()
+            self.cache.pop(workspace_id, None)
+            self.top_tags.pop(workspace_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM interests")
+            self.db.commit()
+            self.cache.clear()
+            self.top_tags.clear()
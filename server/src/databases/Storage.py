@@ -0,0 +1,103 @@
+""" Storage.py
+Shared SQLite access for the server's relational data (bookmarks, workspaces, interests, tags, ...).
+Every thread gets its own connection to the database file, so requests served on different
+threads do not share a cursor. A thread's connection is closed when the thread exits, so the
+short-lived threads of the ingestion pipeline do not leave connections open. WAL mode lets readers run while one writer commits, and
+busy_timeout makes a writer wait for the lock instead of failing with "database is locked".
+Paths are resolved to absolute paths, independent of the working directory.
+"""
+import os
+import sqlite3
+import threading
+
+from ..utils.Logger import setup_logger
+
+logger = setup_logger("storage", stream=False)
+
+cur_path = os.path.dirname(os.path.abspath(__file__))
+DATABASE_PATH = os.path.abspath(f"{cur_path}/../../database/NewsAgent.db")
+
+_storages = {}
+_storages_lock = threading.Lock()
+
+
+class ThreadConnection:
+    # connection held in the thread-local storage, dropped and closed when its thread exits
+    def __init__(self, storage, conn):
+        self.storage = storage
+        self.conn = conn
+
+    def __del__(self):
+        self.storage.release(self.conn)
+
+
+class SQLiteStorage:
+    def __init__(self, database_path=DATABASE_PATH, busy_timeout=5000):
+        """
+        :param busy_timeout: milliseconds a connection waits for a lock held by another connection
+        """
+        self.database_path = os.path.abspath(database_path)
+        self.busy_timeout = busy_timeout
+        os.makedirs(os.path.dirname(self.database_path), exist_ok=True)
+
+        self.local = threading.local()
+        # connections of live threads, so they can be closed on shutdown
+        self.connections = set()
+        # reentrant, a connection may be released by garbage collection while the lock is held
+        self.connections_lock = threading.RLock()
+
+    def connection(self):
+        # connection of the calling thread, opened on first use
+        holder = getattr(self.local, "holder", None)
+        if holder is None:
+            conn = sqlite3.connect(self.database_path, timeout=self.busy_timeout / 1000, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            with self.connections_lock:
+                self.connections.add(conn)
+            holder = ThreadConnection(self, conn)
+            self.local.holder = holder
+            logger.info(f"Opened connection to {self.database_path} for thread {threading.current_thread().name}")
+        return holder.conn
+
+    def release(self, conn):
+        # close the connection of an exited thread, unless close() already did
+        with self.connections_lock:
+            if conn not in self.connections:
+                return
+            self.connections.discard(conn)
+        conn.close()
+
+    def execute(self, sql, params=()):
+        return self.connection().execute(sql, params)
+
+    def executemany(self, sql, params):
+        return self.connection().executemany(sql, params)
+
+    def commit(self):
+        self.connection().commit()
+
+    def close(self):
+        with self.connections_lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = set()
+        self.local = threading.local()
+
+
+def get_storage(database_path=DATABASE_PATH):
+    # one storage per database file, shared by every class using it
+    path = os.path.abspath(database_path)
+    with _storages_lock:
+        if path not in _storages:
+            _storages[path] = SQLiteStorage(path)
+        return _storages[path]
+
+
+def close_all():
+    # every storage of the process, e.g. NewsAgent.db and CompletionCache.db, on shutdown
+    with _storages_lock:
+        storages = list(_storages.values())
+    for storage in storages:
+        storage.close()
@@ -1,8 +1,8 @@
 import os
 import uuid
 import json
-import sqlite3
 
+from .Storage import get_storage
 from ..utils.Logger import setup_logger
 
 class WorkspaceDatabase:
@@ -14,42 +14,42 @@ class WorkspaceDatabase:
         # setup database
         self.collection_name = "workspaces"
         
-        self.conn = sqlite3.connect("../../database/NewsAgent.db")
-        self.cursor = self.conn.cursor()
+        # per-thread connections, requests do not share a cursor
+        self.db = get_storage()
         
         # create table if not exists bookmarks
         if not self.table_exists(self.collection_name):
             self.create_table()
+        self.db.execute(f"CREATE INDEX IF NOT EXISTS idx_workspaces_user ON {self.collection_name} (user_id)")
+        self.db.commit()
         
     def create_table(self):
         # id 
-        self.cursor.execute("""
+        self.db.execute("""
                 CREATE TABLE workspaces (
                     id TEXT PRIMARY KEY,
                     name TEXT,
                     user_id TEXT
                 )
             """)
-        self.conn.commit()
+        self.db.commit()
         
     def table_exists(self, table_name):
         try:
-            result = self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table_name}'")
+            result = self.db.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
             if result.fetchone():
                 return True
             else:
                 return False
         except Exception as e:
-            data_logger.error(f"Failed to check if table exists: {e}")
+            self.logger.error(f"Failed to check if table exists: {e}")
             return False
 
     def get_all_workspaces(self):
-        self.cursor.execute(f"SELECT * FROM {self.collection_name}")
-        return self.cursor.fetchall()
+        return self.db.execute(f"SELECT * FROM {self.collection_name}").fetchall()
 
     def get_workspaces_by_user_id(self, user_id):
-        self.cursor.execute(f"SELECT * FROM {self.collection_name} WHERE user_id=?", (user_id,))
-        result = self.cursor.fetchall()
+        result = self.db.execute(f"SELECT * FROM {self.collection_name} WHERE user_id=?", (user_id,)).fetchall()
 
         workspaces = []
         for row in result:
@@ -63,13 +63,11 @@ class WorkspaceDatabase:
         return workspaces
 
     def get_workspace_by_id(self, workspace_id):
-        self.cursor.execute(f"SELECT * FROM {self.collection_name} WHERE id=?", (workspace_id,))
-        return self.cursor.fetchone()
+        return self.db.execute(f"SELECT * FROM {self.collection_name} WHERE id=?", (workspace_id,)).fetchone()
 
     def add_workspace(self, user_id, workspace_name):
         # check if workspace already exists
-        self.cursor.execute(f"SELECT * FROM {self.collection_name} WHERE name=? AND user_id=?", (workspace_name, user_id))
-        result = self.cursor.fetchone()
+        result = self.db.execute(f"SELECT * FROM {self.collection_name} WHERE name=? AND user_id=?", (workspace_name, user_id)).fetchone()
         
         if result:
             raise ValueError(f"Workspace with name {workspace_name} for user {user_id} already exists")
@@ -78,8 +76,8 @@ class WorkspaceDatabase:
         workspace_id = str(uuid.uuid4())    
         
         # insert the new workspace into the database
-        self.cursor.execute(f"INSERT INTO {self.collection_name} (id, name, user_id) VALUES (?, ?, ?)", (workspace_id, workspace_name, user_id))
-        self.conn.commit()
+        self.db.execute(f"INSERT INTO {self.collection_name} (id, name, user_id) VALUES (?, ?, ?)", (workspace_id, workspace_name, user_id))
+        self.db.commit()
         
         return {
             "id": workspace_id,
@@ -90,8 +88,8 @@ class WorkspaceDatabase:
     def delete_workspace(self, user_id, workspace_id):
         # delete the workspace from the database
         self.logger.info(f"Deleting workspace with id {workspace_id} for user {user_id}")
-        self.cursor.execute(f"DELETE FROM {self.collection_name} WHERE id=? AND user_id=?", (workspace_id, user_id))
-        self.conn.commit()
+        self.db.execute(f"DELETE FROM {self.collection_name} WHERE id=? AND user_id=?", (workspace_id, user_id))
+        self.db.commit()
         
         return {
             "status": "success",
@@ -0,0 +1,60 @@
+""" BaseModelClient.py
+Common interface of the model clients.
+Subclasses implement generate(); get_model_response() serves identical
+(model, context, prompt) requests from the completion cache when one is given.
+Subclasses whose output depends on the task (e.g. a token cap) return it from generation_params().
+"""
+import asyncio
+
+
+class BaseModelClient:
+    # whether get_model_responses runs prompts in batched forward passes
+    supports_batching = False
+
+    def __init__(self, model_id, cache=None):
+        """
+        :param model_id: identifies the model in cache keys, e.g. "ust/gpt-4o-mini"
+        :param cache: CompletionCache shared between clients, None to disable caching
+        """
+        self.model_id = model_id
+        self.cache = cache
+
+    def generate(self, prompt, context=None):
+        raise NotImplementedError
+
+    def generation_params(self, task=None):
+        # settings of a task that change the completion, part of the cache key
+        return None
+
+    def get_cached_response(self, prompt, context=None, task=None):
+        if self.cache is None:
+            return None
+        response = self.cache.get(self.model_id, context, prompt, params=self.generation_params(task))
+        if response is not None:
+            self.logger.info(f"Completion cache hit for prompt: {prompt[:100]}")
+        return response
+
+    def cache_response(self, prompt, context, response, task=None):
+        # failed generations return None or empty text, retry them next time
+        if self.cache is not None and response:
+            self.cache.set(self.model_id, context, prompt, response, params=self.generation_params(task))
+
+    def get_model_response(self, prompt, context=None):
+        response = self.get_cached_response(prompt, context)
+        if response is not None:
+            return response
+
+        response = self.generate(prompt, context)
+        self.cache_response(prompt, context, response)
+        return response
+
+    def get_model_responses(self, prompts, batch_size=8, task=None, context=None):
+        """
+        Completions of many prompts, in order.
+        Remote clients send one request per prompt, local models override this to batch them.
+        """
+        return [self.get_model_response(prompt, context) for prompt in prompts]
+
+    async def get_model_response_async(self, prompt, context=None):
+        # sqlite lookups and local generation are blocking, keep them off the event loop
+        return await asyncio.to_thread(self.get_model_response, prompt, context)
@@ -0,0 +1,141 @@
+""" CompletionCache.py
+Content-addressed cache of model completions, keyed by a hash of (model, context, prompt) and
+the generation parameters that change the output, e.g. the cap on generated tokens.
+Stored in SQLite so it is shared by the server and the DataFetcher CLI and survives restarts,
+e.g. re-summarizing the same articles after a crash and --start_page resume.
+Least recently used completions are evicted once the stored text exceeds max_bytes.
+"""
+import os
+import time
+import json
+import hashlib
+import threading
+
+from ..utils.Logger import setup_logger
+from ..databases.Storage import get_storage
+
+
+class CompletionCache:
+    def __init__(self, database_path, max_bytes=256 * 1024 * 1024):
+        self.logger = setup_logger("completionCache", stream=False)
+        self.max_bytes = max_bytes
+
+        # per-thread connections in WAL mode, so lookups from the server and the CLI do not block each other
+        self.db = get_storage(database_path)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self.create_table()
+        with self.lock:
+            self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+
+    def create_table(self):
+        with self.lock:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    response TEXT,
+                    size INTEGER,
+                    created_at REAL,
+                    accessed_at REAL
+                )
+            """)
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_completions_accessed_at ON completions (accessed_at)")
+            self.db.commit()
+
+    @staticmethod
+    def make_key(model, context, prompt, params=None):
+        # keys of clients without generation parameters stay the same
+        fields = [model, context, prompt] + ([params] if params else [])
+        return hashlib.sha256(json.dumps(fields, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, model, context, prompt, params=None):
+        """
+        :param params: dict of generation parameters the completion depends on
+        """
+        key = self.make_key(model, context, prompt, params)
+        with self.lock:
+            row = self.db.execute("SELECT response FROM completions WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self.db.execute("UPDATE completions SET accessed_at=? WHERE key=?", (time.time(), key))
+            self.db.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, model, context, prompt, response, params=None):
+        key = self.make_key(model, context, prompt, params)
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self.lock:
+            previous = self.db.execute("SELECT size FROM completions WHERE key=?", (key,)).fetchone()
+            self.db.execute("""
+                INSERT OR REPLACE INTO completions (key, model, response, size, created_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (key, model, response, size, now, now))
+            self.db.commit()
+            self.total_bytes += size - (previous[0] if previous else 0)
+
+            if self.total_bytes > self.max_bytes:
+                self.evict()
+
+    def evict(self):
+        # caller holds the lock
+        # other processes write to the same file, so recount before deleting anything
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if self.total_bytes <= self.max_bytes:
+            return
+
+        # drop least recently used completions until the cache is 10% below its limit
+        target = self.max_bytes * 0.9
+        evicted_keys = []
+        for key, size in self.db.execute("SELECT key, size FROM completions ORDER BY accessed_at"):
+            if self.total_bytes <= target:
+                break
+            evicted_keys.append((key,))
+            self.total_bytes -= size
+
+        self.db.executemany("DELETE FROM completions WHERE key=?", evicted_keys)
+        self.db.commit()
+        self.logger.info(f"Evicted {len(evicted_keys)} completions, {self.total_bytes} bytes left")
+
+    def clear(self):
+        with self.lock:
+            self.db.execute("DELETE FROM completions")
+            self.db.commit()
+            self.total_bytes = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0
+            }
+
+
+# one cache per database file, shared by all model clients of the process
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_completion_cache(config):
+    """
+    :return: the shared completion cache, or None if disabled in config.json
+    """
+    if not config.model["completion_cache"]:
+        return None
+
+    cur_path = os.path.dirname(os.path.abspath(__file__))
+    database_path = os.path.abspath(f"{cur_path}/../../database/CompletionCache.db")
+    with _caches_lock:
+        if database_path not in _caches:
+            _caches[database_path] = CompletionCache(database_path, max_bytes=config.model["completion_cache_size_mb"] * 1024 * 1024)
+        return _caches[database_path]
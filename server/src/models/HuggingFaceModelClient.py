@@ -5,31 +5,52 @@ import torch
 import transformers
 from transformers import pipeline
 
-from ..utils.Logger import setup_logger 
+from .BaseModelClient import BaseModelClient
+from ..utils.Logger import setup_logger
 
 model_logger = setup_logger("hfmodel", "hfmodel", stream=False)
 
-class HuggingFaceModelClient:
-    def __init__(self, model_name="gemma"):
-        
+MODEL_CARDS = {
+    "gemma": "google/gemma-3-12b-it",
+    "nemotron": "nvidia/Llama-3.1-Nemotron-Nano-8B-v1"
+}
+
+# generation stops at these caps, a 150-word summary with tags fits well within 512 tokens
+MAX_NEW_TOKENS = {
+    "summary": 512,
+    "tags": 64,
+    "default": 1024
+}
+
+class HuggingFaceModelClient(BaseModelClient):
+    supports_batching = True
+
+    def __init__(self, model_name="gemma", cache=None, quantize=False):
+        """
+        :param quantize: int8 dynamic quantization of linear layers when running on CPU
+        """
+        super().__init__(f"hf/{MODEL_CARDS.get(model_name, model_name)}", cache=cache)
+        self.logger = model_logger
+        self.use_cuda = torch.cuda.is_available()
+
         self.model_name = model_name
         if self.model_name == "gemma":
-            model_card_name = "google/gemma-3-12b-it"
-            
+            model_card_name = MODEL_CARDS["gemma"]
+
             self.model = pipeline(
                 "text-generation",
                 model=model_card_name,
-                device=0 if torch.cuda.is_available() else -1,
+                device=0 if self.use_cuda else -1,
                 token=os.getenv("HF_TOKEN"),
             )
-            
-            
+
+
         elif self.model_name== "nemotron":
-            model_card_name = "nvidia/Llama-3.1-Nemotron-Nano-8B-v1"
+            model_card_name = MODEL_CARDS["nemotron"]
             model_kwargs = {"torch_dtype": torch.bfloat16, "device_map": "auto"}
             tokenizer = transformers.AutoTokenizer.from_pretrained(model_card_name)
             tokenizer.pad_token_id = tokenizer.eos_token_id
-            
+
             self.model = pipeline(
                 "text-generation",
                 model=model_card_name,
@@ -37,52 +58,82 @@ class HuggingFaceModelClient:
                 tokenizer=tokenizer,
                 do_sample=False
             )
-    
-    def get_model_response(self, prompt):
+
+        # decoder-only models generate after the last token, so batches are padded on the left
+        if self.model.tokenizer.pad_token_id is None:
+            self.model.tokenizer.pad_token_id = self.model.tokenizer.eos_token_id
+        self.model.tokenizer.padding_side = "left"
+
+        if quantize and not self.use_cuda:
+            model_logger.info(f"Quantizing {model_card_name} for CPU inference")
+            self.model.model = torch.quantization.quantize_dynamic(self.model.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def build_messages(self, prompt, context=None):
         if self.model_name == "gemma":
-            messages = [
+            return [
                 {
                     "role": "system",
-                    "content": [{"type": "text", "text": "You are a news curator that summarizes news articles."}]
+                    "content": [{"type": "text", "text": context if context else "You are a news curator that summarizes news articles."}]
                 },
                 {
-                    "role": "user", 
+                    "role": "user",
                     "content": [{"type": "text", "text": prompt}]
                 }
             ]
-            
-            try:
-                with torch.no_grad():
-                    response = self.model(messages, max_new_tokens=5000)
-                    
-                model_logger.info(f"\n=======\n[Prompt] {prompt}\n\n[Response] {response}")
-            except Exception as e:
-                model_logger.error(f"Error in HuggingFaceModelClient: {e}")
-                return None
-            
-            text = response[0]['generated_text'][-1]["content"]
-            torch.cuda.empty_cache()
-            
-        elif self.model_name == "nemotron":
-            messages = [
-                {"role": "system", "content": "detailed thinking off"},
-                {"role": "user", "content": prompt}
-            ]
-            try:
-                with torch.no_grad():
-                    response = self.model(messages, max_length=5000)
-                    
-                model_logger.info(f"\n=======\n[Prompt] {messages}\n\n[Response] {response}")
-            except Exception as e:
-                model_logger.error(f"Error in HuggingFaceModelClient: {e}")
-                return None
-            text = response[0]["generated_text"][-1]["content"]
-            # text = response[0]['generated_text']
-            torch.cuda.empty_cache()
-        return text
+
+        return [
+            {"role": "system", "content": "detailed thinking off"},
+            {"role": "user", "content": f"{context}\n{prompt}" if context else prompt}
+        ]
+
+    def generation_params(self, task=None):
+        # a completion truncated at the cap of one task must not be reused for another
+        return {"max_new_tokens": MAX_NEW_TOKENS.get(task, MAX_NEW_TOKENS["default"])}
+
+    def generate_batch(self, prompts, batch_size, task=None, context=None):
+        conversations = [self.build_messages(prompt, context) for prompt in prompts]
+        max_new_tokens = self.generation_params(task)["max_new_tokens"]
+
+        try:
+            with torch.no_grad():
+                responses = self.model(conversations, batch_size=batch_size, max_new_tokens=max_new_tokens)
+        except Exception as e:
+            model_logger.error(f"Error in HuggingFaceModelClient: {e}")
+            return [None] * len(prompts)
+        finally:
+            # once per batch rather than per prompt
+            if self.use_cuda:
+                torch.cuda.empty_cache()
+
+        texts = []
+        for prompt, response in zip(prompts, responses):
+            model_logger.info(f"\n=======\n[Prompt] {prompt}\n\n[Response] {response}")
+            texts.append(response[0]["generated_text"][-1]["content"])
+        return texts
+
+    def generate(self, prompt, context=None):
+        return self.generate_batch([prompt], batch_size=1, context=context)[0]
+
+    def get_model_responses(self, prompts, batch_size=8, task=None, context=None):
+        """
+        Generate completions of many prompts, batch_size prompts per forward pass.
+        :param task: "summary", "tags" or None, selects the cap on generated tokens
+        :return: completions in the order of prompts, None for failed ones
+        """
+        responses = [self.get_cached_response(prompt, context, task=task) for prompt in prompts]
+        missing = [i for i, response in enumerate(responses) if response is None]
+
+        for start in range(0, len(missing), batch_size):
+            indices = missing[start:start + batch_size]
+            texts = self.generate_batch([prompts[i] for i in indices], batch_size, task=task, context=context)
+            for i, text in zip(indices, texts):
+                responses[i] = text
+                self.cache_response(prompts[i], context, text, task=task)
+
+        return responses
 
     def clear(self):
         # clear the model
         del self.model
         torch.cuda.empty_cache()
-        
\ No newline at end of file
+
@@ -3,18 +3,25 @@ import os
 
 from ollama import chat
 
+from .BaseModelClient import BaseModelClient
 from ..utils.Logger import setup_logger 
 
 
-class OllamaModelClient:
-    def __init__(self, model_type="deepseek-r1"):
+class OllamaModelClient(BaseModelClient):
+    def __init__(self, model_type="deepseek-r1", cache=None):
+        super().__init__(f"ollama/{model_type}", cache=cache)
         self.model = model_type
         self.logger = setup_logger("OllamaModel", stream=False)
         
-    def get_model_response(self, prompt):
+    def generate(self, prompt, context=None):
+        messages = []
+        if context:
+            messages.append({"role": "user", "content": context})
+        messages.append({"role": "user", "content": prompt})
+        
         response = chat(
             model=self.model,
-            messages=[{"role": "user", "content": prompt}]
+            messages=messages
         )
         
         self.logger.info(f"\n=======\n[Prompt] {prompt}\n\n[Response] {response}")
@@ -0,0 +1,124 @@
+""" Rerankers.py
+Rerankers order candidate articles by relevance to a query.
+Selected through query.article_rank_mode in config.json:
+    "algo"          - LLM ranking (one completion per query)
+    "cross_encoder" - local cross-encoder, batched on CPU
+    "algo_only"     - no reranker, ranking uses embeddings similarity and interests only
+"""
+import re
+import time
+import asyncio
+import threading
+
+from ..utils.Logger import setup_logger
+
+logger = setup_logger("reranker", stream=False)
+
+
+def article_text(article):
+    return f"{article['metadata']['title']}\n{article['page_content']}"
+
+
+# indexed article list of LLM prompts, shared by the LLM ranker and the summary prompt
+def article_prompt(articles):
+    result = ""
+    for i, article in enumerate(articles):
+        result += (
+            f"index={i}:\n"
+            f"title={article['metadata']['title']}\n"
+            f"description/summary={article['page_content']}\n"
+        )
+    return result
+
+
+class Reranker:
+    async def rank(self, query, articles):
+        """
+        :return: list of candidate indices from most to least relevant
+        """
+        raise NotImplementedError
+
+
+class LLMReranker(Reranker):
+    def __init__(self, model):
+        self.model = model
+
+    async def rank(self, query, articles):
+        article_string = article_prompt(articles)
+        agent_context = (
+            f"You are a news recommendation expert. Your task is to assist in finding relevant news articles for a user. You will be provided with the user's query and a list of candidate articles to choose from."
+            f"Based on this information, you must rank all {len(articles)} articles from most to least relevant to the user's query. "
+            f"Your output should be structured as follows:"
+            f"<response>[index1, index2, ...]</response>"
+            f"All indices should be included in decreasing order of relevance. "
+        )
+
+        prompt = (
+            f"user_query={query}"
+            f"articles:\n{article_string}"
+        )
+
+        start_time = time.time()
+        response = await self.model.get_model_response_async(prompt, context=agent_context)
+
+        logger.info(f"Took {time.time() - start_time} seconds to generate response: {response}")
+
+        match = re.search(r"<response>\[(.*?)\]</response>", response)
+        if not match:
+            logger.warning(f"Invalid ranking format from LLM: {response}")
+            return []
+
+        try:
+            ranking = [int(i.strip()) for i in match.group(1).split(",")]
+        except ValueError:
+            logger.warning(f"Invalid ranking indices from LLM: {match.group(1)}")
+            return []
+
+        # ignore indices the LLM made up
+        return [index for index in ranking if 0 <= index < len(articles)]
+
+
+class CrossEncoderReranker(Reranker):
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size=16, device="cpu"):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.device = device
+        self.model = None
+        self.load_lock = threading.Lock()
+
+    def load(self):
+        if self.model is None:
+            with self.load_lock:
+                if self.model is None:
+                    from sentence_transformers import CrossEncoder
+                    logger.info(f"Loading cross-encoder {self.model_name} on {self.device}")
+                    self.model = CrossEncoder(self.model_name, device=self.device, max_length=512)
+        return self.model
+
+    def predict(self, query, articles):
+        pairs = [(query, article_text(article)) for article in articles]
+        return self.load().predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+
+    async def rank(self, query, articles):
+        if not articles:
+            return []
+
+        start_time = time.time()
+        # model inference is blocking, keep it off the event loop
+        scores = await asyncio.to_thread(self.predict, query, articles)
+        logger.info(f"Took {time.time() - start_time} seconds to score {len(articles)} articles: {list(scores)}")
+
+        return sorted(range(len(articles)), key=lambda i: scores[i], reverse=True)
+
+
+def get_reranker(rank_mode, model=None, config=None):
+    if rank_mode == "algo_only":
+        return None
+    if rank_mode == "cross_encoder":
+        return CrossEncoderReranker(
+            model_name=config.query["cross_encoder_model"],
+            batch_size=config.query["rerank_batch_size"]
+        )
+    if rank_mode == "algo":
+        return LLMReranker(model)
+    raise ValueError(f"Rank mode {rank_mode} not supported. Please choose from algo, cross_encoder, algo_only.")
@@ -1,38 +1,115 @@
 import dotenv
 import os
-from openai import AzureOpenAI
-from ..utils.Logger import setup_logger 
+import asyncio
+import httpx
+from openai import AzureOpenAI, AsyncAzureOpenAI
+from .BaseModelClient import BaseModelClient
+from ..utils.Logger import setup_logger
 
 
-class USTModelClient:
-    def __init__(self):
+class USTModelClient(BaseModelClient):
+    def __init__(self, max_concurrency=8, max_connections=20, timeout=120, cache=None):
+        self.model_name = "gpt-4o-mini"
+        super().__init__(f"ust/{self.model_name}", cache=cache)
         self.logger = setup_logger("USTModel", stream=False)
         self.client = AzureOpenAI(
             azure_endpoint="https://hkust.azure-api.net",
             api_key=os.getenv("UST_API_KEY"),
             api_version="2025-02-01-preview"
         )
+
+        # async client for the server, concurrent requests share one http connection pool
+        self.async_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout
+        )
+        self.async_client = AsyncAzureOpenAI(
+            azure_endpoint="https://hkust.azure-api.net",
+            api_key=os.getenv("UST_API_KEY"),
+            api_version="2025-02-01-preview",
+            http_client=self.async_http_client
+        )
+        # limit the number of completions in flight at once
+        self.semaphore = asyncio.Semaphore(max_concurrency)
         self.logger.info("USTModelClient initialized")
 
-    def get_model_response(self, prompt, context=None):
+    def build_messages(self, prompt, context=None):
         messages = []
         if context:
             messages.append({"role": "user", "content": context})
         messages.append({"role": "user", "content": prompt})
-        
-        self.logger.info(f"Sending prompt to UST model: {prompt}")
-        
-    
-        response = self.client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages
-        )
-        
+        return messages
+
+    def log_response(self, prompt, response):
         try:
             self.logger.info(f"\n=======\n[Prompt] {prompt}\n\n[Response] {response}")
         except Exception as e:
             self.logger.error(f"Error logging response: {e}")
-        
+
         self.logger.info(f"Received response from UST model")
-        
+
+    def generate(self, prompt, context=None):
+        messages = self.build_messages(prompt, context)
+
+        self.logger.info(f"Sending prompt to UST model: {prompt}")
+
+
+        response = self.client.chat.completions.create(
+            model=self.model_name,
+            messages=messages
+        )
+
+        self.log_response(prompt, response)
+
         return response.choices[0].message.content
+
+    async def get_model_response_async(self, prompt, context=None):
+        cached = await asyncio.to_thread(self.get_cached_response, prompt, context)
+        if cached is not None:
+            return cached
+
+        messages = self.build_messages(prompt, context)
+
+        async with self.semaphore:
+            self.logger.info(f"Sending prompt to UST model: {prompt}")
+            response = await self.async_client.chat.completions.create(
+                model=self.model_name,
+                messages=messages
+            )
+
+        self.log_response(prompt, response)
+
+        text = response.choices[0].message.content
+        await asyncio.to_thread(self.cache_response, prompt, context, text)
+        return text
+
+    # yield the completion text chunk by chunk as the model generates it
+    async def stream_model_response_async(self, prompt, context=None):
+        # a cached completion is sent as a single chunk
+        cached = await asyncio.to_thread(self.get_cached_response, prompt, context)
+        if cached is not None:
+            yield cached
+            return
+
+        messages = self.build_messages(prompt, context)
+
+        text = ""
+        async with self.semaphore:
+            self.logger.info(f"Streaming prompt to UST model: {prompt}")
+            stream = await self.async_client.chat.completions.create(
+                model=self.model_name,
+                messages=messages,
+                stream=True
+            )
+            async for chunk in stream:
+                # azure sends chunks without choices, e.g. content filter results
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                text += chunk.choices[0].delta.content
+                yield chunk.choices[0].delta.content
+
+        self.log_response(prompt, text)
+        await asyncio.to_thread(self.cache_response, prompt, context, text)
+
+    async def close(self):
+        await self.async_client.close()
@@ -1,10 +1,10 @@
 import os
 import re
-import ast
 import json
 import uuid
 import time 
-import requests
+import asyncio
+import numpy as np
 from dotenv import load_dotenv
 from newsplease import NewsPlease
 
@@ -12,28 +12,95 @@ from .databases.ArticleRag import RagDatabase
 from .databases.Bookmarks import BookmarkDatabase
 from .databases.Interest import InterestDatabase
 from .models.USTModelClient import USTModelClient
+from .models.Rerankers import get_reranker, article_prompt
+from .models.CompletionCache import get_completion_cache
 
 from .utils.Logger import setup_logger 
 from .utils.ServerConfig import ServerConfig
+from .utils.TaskGraph import TaskGraph
+from .utils.HttpClient import HttpRequestError, get_http_client, the_news_api_url
+from .utils.SemanticCache import SemanticResponseCache
 
 load_dotenv()
 
+class ResponseTagFilter:
+    """
+    Extract the text between <response> and </response> from a streamed completion.
+    Chunks may split the tags, so a tail that could still be a partial tag is held back.
+    """
+    OPEN_TAG = "<response>"
+    CLOSE_TAG = "</response>"
+    
+    def __init__(self):
+        self.buffer = ""
+        self.state = "before"
+    
+    def feed(self, chunk):
+        if self.state == "done":
+            return ""
+        self.buffer += chunk
+        
+        if self.state == "before":
+            index = self.buffer.find(self.OPEN_TAG)
+            if index == -1:
+                return ""
+            self.buffer = self.buffer[index + len(self.OPEN_TAG):]
+            self.state = "inside"
+        
+        index = self.buffer.find(self.CLOSE_TAG)
+        if index != -1:
+            text = self.buffer[:index]
+            self.buffer = ""
+            self.state = "done"
+            return text
+        
+        keep = len(self.CLOSE_TAG) - 1
+        text, self.buffer = self.buffer[:-keep], self.buffer[-keep:]
+        return text
+    
+    def finish(self):
+        # model ignored the format or stopped early, return whatever is left
+        text = "" if self.state == "done" else self.buffer
+        self.buffer = ""
+        self.state = "done"
+        return text
+
+
 class Query:
-    def __init__(self, config=None, rag_db=None, interest_db=None, bookmark_db=None):
+    def __init__(self, config=None, rag_db=None, interest_db=None, bookmark_db=None, digest_cache=None):
         self.config = config
+        self.digest_cache = digest_cache
         
         self.logger = setup_logger("query")
-        self.model = USTModelClient()
+        self.model = USTModelClient(
+            max_concurrency=self.config.model["max_concurrency"],
+            max_connections=self.config.model["max_connections"],
+            timeout=self.config.model["timeout"],
+            cache=get_completion_cache(self.config)
+        )
+        self.reranker = get_reranker(self.config.query["article_rank_mode"], model=self.model, config=self.config)
+        
+        self.http_client = get_http_client(self.config)
+        
+        # rephrased questions in a workspace reuse the response of an earlier one
+        self.response_cache = None
+        if self.config.query["response_cache"]:
+            self.response_cache = SemanticResponseCache(
+                threshold=self.config.query["response_cache_threshold"],
+                ttl=self.config.query["response_cache_ttl"],
+                max_entries=self.config.query["response_cache_size"],
+                max_workspaces=self.config.query["response_cache_workspaces"]
+            )
         
         if rag_db:
             self.db = rag_db
         else:
-            self.db = RagDatabase()
+            self.db = RagDatabase(config)
         
         if interest_db:
             self.interest_db = interest_db
         else:
-            self.interest_db = InterestDatabase()
+            self.interest_db = InterestDatabase(config, rag_db=self.db)
         
         if bookmark_db:
             self.bookmark_db = bookmark_db
@@ -48,18 +115,8 @@ class Query:
         self.logger.info(f"Retrieved {len(docs)} documents")
         return docs
     
-    def generate_article_prompt(self, articles):
-        result = ""
-        for i, article in enumerate(articles):
-            result += (
-                f"index={i}:\n"
-                f"title={article['metadata']['title']}\n"
-                f"description/summary={article['page_content']}\n"
-            )
-        return result
-    
     # combine user query and user profile to generate keywords for RAG
-    def generate_keywords(self, user_input):
+    async def generate_keywords(self, user_input):
         """
         Generate keywords for RAG retrieval using the LLM.
         :param user_input: String, e.g., "latest AI news"
@@ -77,7 +134,7 @@ class Query:
             f"Do not include explanations, extra text, or deviations from this format:\n\n"
         )
         try:
-            response = self.model.get_model_response(prompt)
+            response = await self.model.get_model_response_async(prompt)
             match = re.search(r"<keywords>(.*?)</keywords>", response)
             if match:
                 keywords = [kw.strip() for kw in match.group(1).split(",")]
@@ -113,7 +170,7 @@ class Query:
         
     
     # use LLM to rephrase user query to get better RAG results
-    def postprocess_query(self, user_input, user_id, workspace_id, context=None, quote=None):
+    async def postprocess_query(self, user_input, user_id, workspace_id, context=None, quote=None, top_tags=None):
         # context to specify the task and output format
         agent_context = (
             f"You are a news recommendation expert. Your task is to assist in finding relevant news articles for a user. You will be provided with the user's query, a snippet from a previously recommended article the user is referring to (if applicable), the current conversation history (if applicable) and the top 5 tags the user is interested in (if applicable). "
@@ -134,7 +191,8 @@ class Query:
         )
         
         if workspace_id:
-            top_tags = self.interest_db.get_top_tags(user_id=user_id, workspace_id=workspace_id, tag_count=5)
+            if top_tags is None:
+                top_tags = self.interest_db.get_top_tags(user_id=user_id, workspace_id=workspace_id, tag_count=5)
             
             prompt += f"top_tags={top_tags}."
             
@@ -142,7 +200,7 @@ class Query:
             prompt += f"conversation_history={context}. "
             
         try:
-            response = self.model.get_model_response(prompt, context=agent_context)
+            response = await self.model.get_model_response_async(prompt, context=agent_context)
         except Exception as e:
             self.logger.error(f"Error generating response: {str(e)}")
         
@@ -154,21 +212,25 @@ class Query:
     # use web search to get articles
     def web_search(self, phrase):
         web_search_count = self.config.query["web_search_count"]
-        # url encode
-        search_string = requests.utils.quote(phrase)
-        self.logger.info(f"conducting web search using string: {search_string}")
+        self.logger.info(f"conducting web search using string: {phrase}")
         
         # use thenewsapi for longer time frmae (limited to 3 articles in result)
-        url = f"https://api.thenewsapi.com/v1/news/all?search={search_string}&language=en&sort=relevance_score&categories=tech&limit={web_search_count}&api_token={os.getenv("THE_NEWS_API_KEY")}"
-        response = requests.get(url)
-
-        # check response
-        if response.status_code != 200:
-            fetcher_logger.error(f"Error fetching data: {response.status_code}")
+        params = {
+            "search": phrase,
+            "language": "en",
+            "sort": "relevance_score",
+            "categories": "tech",
+            "limit": web_search_count,
+            "api_token": os.getenv("THE_NEWS_API_KEY")
+        }
+        try:
+            response = self.http_client.get_json(f"{the_news_api_url()}/news/all", params=params)
+        except HttpRequestError as e:
+            self.logger.error(f"Error fetching data: {e}")
             return None
 
         # Parse the response JSON data
-        data = response.json()["data"]
+        data = response["data"]
         self.logger.info(f"Fetched {len(data)} articles from web search")
         
         
@@ -191,7 +253,39 @@ class Query:
         self.logger.info(f"Web search fetched articles: {[news['metadata']['title'] for news in result]}")
         return result
            
-    def select_articles(self, docs, query, web_search_docs=None, recommended_news_ids=None):
+    # rank candidates with the configured reranker, normalized reciprocal rank per candidate
+    async def get_rank_scores(self, docs, query):
+        ranking = await self.reranker.rank(query, docs)
+        self.logger.info(f"Reranker ranking: {ranking}")
+        
+        # use 1-based ranking
+        rank_scores = np.zeros(len(docs))
+        rank_scores[ranking] = 1.0 / np.arange(1, len(ranking) + 1)
+            
+        # normalize scores
+        total_score = rank_scores.sum()
+        if total_score > 0:            
+            rank_scores /= total_score
+        
+        return rank_scores
+    
+    # similarity from the distances chroma computed during retrieval, normalized over candidates
+    def get_similarity_scores(self, docs):
+        distances = np.array([doc.get("distance", np.nan) for doc in docs], dtype=float)
+        similarity = 1.0 / (1.0 + distances)
+        
+        # web search results have no distance, give them the average similarity
+        known = ~np.isnan(similarity)
+        if not known.any():
+            return np.zeros(len(docs))
+        similarity[~known] = similarity[known].mean()
+        
+        total_score = similarity.sum()
+        if total_score > 0:
+            similarity /= total_score
+        return similarity
+    
+    async def select_articles(self, docs, query, workspace_id=None, web_search_docs=None, recommended_news_ids=None):
         result_count = self.config.query["result_count"]
         candidate_count = self.config.query["candidate_count"]
         rank_mode = self.config.query["article_rank_mode"]
@@ -204,81 +298,48 @@ class Query:
             docs = docs[: candidate_count - len(web_search_docs)]
             docs = web_search_docs + docs
             
-        scores = [0] * len(docs)
-        
-        ############ get llm score ############
-        article_string = self.generate_article_prompt(docs)
-        agent_context = (
-            f"You are a news recommendation expert. Your task is to assist in finding relevant news articles for a user. You will be provided with the user's query and a list of candidate articles to choose from."
-            f"Based on this information, you must rank all {len(docs)} articles from most to least relevant to the user's query. "                
-            f"Your output should be structured as follows:"
-            f"<response>[index1, index2, ...]</response>"
-            f"All indices should be included in decreasing order of relevance. "
-        )
-            
-        prompt = (
-            f"user_query={query}"
-            f"articles:\n{article_string}"
-        )
+        scores = np.zeros(len(docs))
+        similarity_weight = self.config.query["embeddings_similarity_weight"]
+        interest_weight = self.config.query["interest_weight"]
+        # without a reranker and weights all scores are zero, rank by similarity alone
+        if not self.reranker and similarity_weight == 0 and interest_weight == 0:
+            similarity_weight = 1
         
-        start_time = time.time()
-        response = self.model.get_model_response(prompt, context=agent_context)
+        ############ get llm / cross-encoder score ############
+        # "algo_only" has no reranker and ranks by embeddings similarity and interests alone
+        if self.reranker:
+            scores += await self.get_rank_scores(docs, query) * self.config.query["llm_weight"]
         
-        self.logger.info(f"Took {time.time() - start_time} seconds to generate response: {response}")
-        
-        match = re.search(r"<response>\[(.*?)\]</response>", response)
-        if match:
-            llm_ranking = [int(i.strip()) for i in match.group(1).split(",")]
-        else:
-            llm_ranking = []
-            
-        # use 1-based ranking
-        llm_ranking = [(index, rank + 1) for rank, index in enumerate(llm_ranking)]
-        self.logger.info(f"LLM ranking: {llm_ranking}")
-        
-        # get the scores from rankings
-        llm_scores = []
-        for i, (index, rank) in enumerate(llm_ranking):
-            score = 1.0 / rank
-            llm_scores.append((index, score))
-            
-        # normalize llm scores
-        total_score = sum([score for _, score in llm_scores])
-
-        if total_score > 0:            
-            llm_scores = [(i, score / total_score) for i, score in llm_scores]
-            
-        # self.logger.info(f"Extract LLM scores {llm_scores}")
-        
-        for i, score in llm_scores:
-            scores[i] += score * self.config.query["llm_weight"]
+        ############ get embeddings similarity score ############
+        scores += self.get_similarity_scores(docs) * similarity_weight
         
         ############ get tags score ############
         # TODO: consider if tags are really useful here
-        tags_scores = []
-        for i, doc in enumerate(docs):
-            tags = ast.literal_eval(doc["metadata"].get("tags", "[]"))
-            score = 0
-            for tag in tags:
-                score += self.interest_db.get_tag_score(tag)
-            
-            tags_scores.append((i, score))
+        doc_tags = [doc["metadata"].get("tags", []) for doc in docs]
+        
+        # resolve the tags of all candidates in one lookup, then sum them per candidate
+        flat_tags = [tag for tags in doc_tags for tag in tags]
+        tag_owners = np.repeat(np.arange(len(docs)), [len(tags) for tags in doc_tags])
+        tag_scores = await asyncio.to_thread(self.interest_db.get_tag_scores, flat_tags, workspace_id)
+        # one strong tag should not outweigh the rest of an article's tags
+        tag_scores = np.minimum(tag_scores, self.config.tags["max_tag_contribution"])
+        tags_scores = np.bincount(
+            tag_owners,
+            weights=tag_scores,
+            minlength=len(docs)
+        )
             
         # normalize tag scores
-        total_score = sum([score for _, score in tags_scores])
+        total_score = tags_scores.sum()
         if total_score > 0:
-            tags_scores = [(i, score / total_score) for i, score in tags_scores]
-        
-        # self.logger.info(f"Extract tags scores: {tags_scores}")
+            tags_scores /= total_score
         
         # update scores
-        for i, score in tags_scores:
-            scores[i] += self.config.query["interest_weight"]
-        # TODO (optional): get RAG score by embeddings similarity
+        scores += tags_scores * interest_weight
         
         ############ extract score ############
-        scores = [(i, score) for i, score in enumerate(scores)]
-        scores.sort(key=lambda x: x[1], reverse=True)
+        order = np.argsort(-scores, kind="stable")
+        scores = [(int(i), float(scores[i])) for i in order]
     
         self.logger.info(f"Extract scores: {scores}")
         
@@ -317,36 +378,9 @@ class Query:
         selected_articles = [docs[i] for i in selected_indices]
         return selected_articles
     
-    def generate_response(self, query,user_id, workspace_id, context=None, quote=None, recommended_news_ids=None):
-        # load configs
-        rag_mode = self.config.query["rag_mode"]        
+    def generate_summary_prompt(self, query, selected_articles):
         retrieve_count = self.config.query["retrieve_count"]
         
-        # ingest query to generate web and rag search strings
-        parse_result = self.postprocess_query(query, context=context, user_id=user_id, workspace_id=workspace_id, quote=quote)
-        
-        # retrieve articles
-        docs = self.retrieve_data(parse_result["rag_query"], result_count=retrieve_count)
-            
-        # log the retrieved articles
-        try:
-            self.logger.info(f"Retrieved {len(docs)} documents")
-            for i, doc in enumerate(docs):
-                self.logger.info(f"Document {i}: {doc["metadata"]['title']}")
-        except Exception as e:
-            self.logger.error(f"Error logging documents: {str(e)}")
-            self.logger.info(f"Retrieved documents {docs}")
-            
-            
-        if parse_result["web_search_required"]:
-            web_search_docs = self.web_search(parse_result["web_search_phrase"])
-
-            selected_articles = self.select_articles(docs, query, web_search_docs=web_search_docs, recommended_news_ids=recommended_news_ids)
-        else:
-            selected_articles = self.select_articles(docs, query, recommended_news_ids=recommended_news_ids)
-        
-        
-        # generate a short answer for user's query based on thh selected summary
         agent_context = (
             f"You are a news recommendation expert. Your task is to curate news articles to answer user's query."
             f"You will be provided with the user's query and {retrieve_count} articles ."
@@ -356,33 +390,205 @@ class Query:
         )
         
         # TODO: use rephrased query instead of raw query
-        article_string = self.generate_article_prompt(selected_articles)
+        article_string = article_prompt(selected_articles)
         prompt = (
             f"user_query='{query}'."
             f"articles:\n{article_string}"            
         )
-        
-        summary = self.model.get_model_response(prompt, context=agent_context)
+        return prompt, agent_context
+    
+    # generate a short answer for user's query based on the selected summary
+    async def summarize_articles(self, query, selected_articles):
+        prompt, agent_context = self.generate_summary_prompt(query, selected_articles)
+        summary = await self.model.get_model_response_async(prompt, context=agent_context)
         summary = re.search(r"<response>(.*?)</response>", summary).group(1)
+        return summary
+    
+    def log_retrieved_documents(self, docs):
+        try:
+            self.logger.info(f"Retrieved {len(docs)} documents")
+            for i, doc in enumerate(docs):
+                self.logger.info(f"Document {i}: {doc["metadata"]['title']}")
+        except Exception as e:
+            self.logger.error(f"Error logging documents: {str(e)}")
+            self.logger.info(f"Retrieved documents {docs}")
+    
+    # build the retrieval and ranking steps, summary is optional so it can be streamed instead
+    def build_parse_graph(self, query, user_id, workspace_id, context=None, quote=None):
+        def top_tags():
+            if not workspace_id:
+                return None
+            return self.interest_db.get_top_tags(user_id=user_id, workspace_id=workspace_id, tag_count=5)
         
+        # ingest query to generate web and rag search strings
+        async def parse_result(top_tags):
+            return await self.postprocess_query(query, context=context, user_id=user_id, workspace_id=workspace_id, quote=quote, top_tags=top_tags)
+        
+        return (
+            TaskGraph()
+            .add("top_tags", top_tags)
+            .add("parse_result", parse_result, deps=["top_tags"])
+        )
+    
+    def build_query_graph(self, query, user_id, workspace_id, context=None, quote=None, recommended_news_ids=None, include_summary=True, parse_result=None):
+        # load configs
+        rag_mode = self.config.query["rag_mode"]        
+        retrieve_count = self.config.query["retrieve_count"]
         
-        articles_with_bookmarks = self.bookmark_db.add_bookmark_status(selected_articles, user_id, workspace_id)
+        # each step runs as soon as the steps it depends on are done,
+        # e.g. web search and database retrieval run concurrently
+        if parse_result is None:
+            graph = self.build_parse_graph(query, user_id, workspace_id, context=context, quote=quote)
+        else:
+            # query was already postprocessed, e.g. for a response cache lookup
+            async def given_parse_result():
+                return parse_result
+            graph = TaskGraph().add("parse_result", given_parse_result)
+        
+        # retrieve articles
+        def docs(parse_result):
+            docs = self.retrieve_data(parse_result["rag_query"], result_count=retrieve_count)
+            self.log_retrieved_documents(docs)
+            return docs
+        
+        def web_search_docs(parse_result):
+            if not parse_result["web_search_required"]:
+                return None
+            return self.web_search(parse_result["web_search_phrase"])
+        
+        async def selected_articles(docs, web_search_docs):
+            return await self.select_articles(docs, query, workspace_id=workspace_id, web_search_docs=web_search_docs, recommended_news_ids=recommended_news_ids)
+        
+        async def summary(selected_articles):
+            return await self.summarize_articles(query, selected_articles)
+        
+        def articles_with_bookmarks(selected_articles):
+            return self.bookmark_db.add_bookmark_status(selected_articles, user_id, workspace_id)
+        
+        (
+            graph
+            .add("docs", docs, deps=["parse_result"])
+            .add("web_search_docs", web_search_docs, deps=["parse_result"])
+            .add("selected_articles", selected_articles, deps=["docs", "web_search_docs"])
+            .add("articles_with_bookmarks", articles_with_bookmarks, deps=["selected_articles"])
+        )
+        if include_summary:
+            graph.add("summary", summary, deps=["selected_articles"])
+        
+        return graph
+    
+    async def generate_response(self, query,user_id, workspace_id, context=None, quote=None, recommended_news_ids=None):
+        if not self.response_cache:
+            graph = self.build_query_graph(query, user_id, workspace_id, context=context, quote=quote, recommended_news_ids=recommended_news_ids)
+            results, timings = await graph.run()
+            return self.build_response(query, results["articles_with_bookmarks"], results["summary"], timings)
+        
+        # postprocess first, rephrasings of a question map to similar rag queries
+        parse_graph = self.build_parse_graph(query, user_id, workspace_id, context=context, quote=quote)
+        parse_results, timings = await parse_graph.run()
+        parse_result = parse_results["parse_result"]
+        
+        # snapshot before retrieval, a response computed during an ingestion is stored under the old snapshot
+        version = self.db.version
+        
+        start_time = time.perf_counter()
+        query_embedding = await asyncio.to_thread(self.db.embed_query, parse_result["rag_query"])
+        cached = self.response_cache.get(workspace_id, query_embedding, version, exclude_ids=recommended_news_ids)
+        timings["response_cache"] = time.perf_counter() - start_time
+        
+        if cached:
+            self.logger.info(f"Using cached response for query '{query}' (rag_query '{parse_result['rag_query']}')")
+            # bookmarks change independently of the response, add their status to copies
+            articles = [dict(article) for article in cached["articles"]]
+            articles_with_bookmarks = await asyncio.to_thread(self.bookmark_db.add_bookmark_status, articles, user_id, workspace_id)
+            timings["total"] += timings["response_cache"]
+            return self.build_response(query, articles_with_bookmarks, cached["summary"], timings)
+        
+        graph = self.build_query_graph(query, user_id, workspace_id, context=context, quote=quote, recommended_news_ids=recommended_news_ids, parse_result=parse_result)
+        results, query_timings = await graph.run()
+        
+        self.response_cache.set(workspace_id, query_embedding, {
+            "articles": [dict(article) for article in results["selected_articles"]],
+            "summary": results["summary"]
+        }, version)
+        
+        total = timings["total"] + timings["response_cache"] + query_timings.pop("total")
+        query_timings.pop("parse_result", None)
+        timings.update(query_timings)
+        timings["total"] = total
+        return self.build_response(query, results["articles_with_bookmarks"], results["summary"], timings)
+    
+    def build_response(self, query, articles, summary, timings):
+        self.logger.info(f"Stage latency for query '{query}': {timings}")
         
         response = {
-            "articles": articles_with_bookmarks,
-            "summary": summary
+            "articles": articles,
+            "summary": summary,
+            "latency": timings
         }
         
         # self.logger.info(f"Generated response: {response}")
         return response
+    
+    async def stream_response(self, query, user_id, workspace_id, context=None, quote=None, recommended_news_ids=None):
+        """
+        Streaming variant of generate_response.
+        Yields (event, data) pairs: the articles as soon as ranking is done,
+        then the summary text chunk by chunk, then the final stage latency.
+        """
+        graph = self.build_query_graph(query, user_id, workspace_id, context=context, quote=quote, recommended_news_ids=recommended_news_ids, include_summary=False)
+        results, timings = await graph.run()
+        
+        self.logger.info(f"Stage latency to first article for query '{query}': {timings}")
+        yield "articles", {"articles": results["articles_with_bookmarks"], "latency": timings}
+        
+        prompt, agent_context = self.generate_summary_prompt(query, results["selected_articles"])
+        
+        start_time = time.perf_counter()
+        response_filter = ResponseTagFilter()
+        async for chunk in self.model.stream_model_response_async(prompt, context=agent_context):
+            text = response_filter.feed(chunk)
+            if text:
+                yield "summary", text
+        
+        text = response_filter.finish()
+        if text:
+            yield "summary", text
+        
+        timings["summary"] = time.perf_counter() - start_time
+        timings["total"] += timings["summary"]
+        yield "done", {"latency": timings}
 
     # recommend news to users based on their interests and maintain diversity
-    def daily_recommendation(self, user_id, workspace_id):
+    async def daily_recommendation(self, user_id, workspace_id):
+        # digest is cached until new articles are ingested or the workspace's interests change
+        digest = self.digest_cache.get(user_id, workspace_id, snapshot=self.db.version) if self.digest_cache else None
+        if digest is None:
+            digest = await self.compute_daily_digest(user_id, workspace_id)
+        else:
+            self.logger.info(f"Using cached daily digest for workspace {workspace_id}")
+        
+        # add bookmark status to copies of the articles, bookmarks change independently of the digest
+        articles = [dict(article) for article in digest["articles"]]
+        articles_with_bookmarks = await asyncio.to_thread(self.bookmark_db.add_bookmark_status, articles, user_id, workspace_id)
+        
+        response = {
+            "articles": articles_with_bookmarks,
+            "summary": digest["summary"]
+        }
+        
+        # self.logger.info(f"Generated response: {response}")
+        return response
+    
+    async def compute_daily_digest(self, user_id, workspace_id):
+        cache_version = self.digest_cache.version_of(workspace_id) if self.digest_cache else None
+        snapshot = self.db.version
+        
         # get top 10 tags the user likes
-        top_tags = self.interest_db.get_top_tags(user_id=user_id, workspace_id=workspace_id, tag_count=10) 
+        top_tags = await asyncio.to_thread(self.interest_db.get_top_tags, user_id=user_id, workspace_id=workspace_id, tag_count=10)
         
         # do rag search based on the tags
-        docs = self.db.similarity_search(" ".join(top_tags), n_results=10)
+        docs = await asyncio.to_thread(self.db.similarity_search, " ".join(top_tags), n_results=10)
         
         self.logger.info(f"Retrieved {len(docs)} documents: {docs}")
         
@@ -407,22 +613,34 @@ class Query:
             f"Return your response as a single sentence wrapped in <response> tags, formatted exactly as '<response>Short answer here.</response>'. "
         )
         
-        summary = self.model.get_model_response(prompt)
+        summary = await self.model.get_model_response_async(prompt)
         summary = re.search(r"<response>(.*?)</response>", summary).group(1)
         
         # add a greeting message
         summary = "Good news! Here are some articles you may like:\n" + summary
         
-        # add bookmark status to articles
-        articles_with_bookmarks = self.bookmark_db.add_bookmark_status(selected_articles, user_id, workspace_id)
-        
-        response = {
-            "articles": articles_with_bookmarks,
+        digest = {
+            "articles": selected_articles,
             "summary": summary
         }
         
-        # self.logger.info(f"Generated response: {response}")
-        return response
+        # skipped if an ingestion or interest update happened while computing
+        if self.digest_cache:
+            self.digest_cache.set(user_id, workspace_id, digest, version=cache_version, snapshot=snapshot)
+        return digest
+    
+    # precompute digests of recently active workspaces, e.g. after an ingestion run
+    async def warm_daily_digests(self):
+        if not self.digest_cache:
+            return
+        
+        workspaces = self.digest_cache.active_workspaces()
+        self.logger.info(f"Warming daily digests for {len(workspaces)} active workspaces")
+        for user_id, workspace_id in workspaces:
+            try:
+                await self.compute_daily_digest(user_id, workspace_id)
+            except Exception as e:
+                self.logger.error(f"Failed to warm daily digest for workspace {workspace_id}: {e}")
 
     
 if __name__ == "__main__":
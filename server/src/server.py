@@ -3,19 +3,27 @@ The main entry point for the FastAPI server.
 """
 # server accessed through api
 import os
+import json
+import asyncio
 import fastapi, pydantic
 import dotenv
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 
 # import custom modules
 from .utils.ServerConfig import ServerConfig
 from .utils.Logger import setup_logger
 from .utils.DataFetcher import DataFetcher
+from .utils.DigestCache import DailyDigestCache
+from .utils.RequestExecutor import RequestExecutor
+from .utils.JobManager import JobManager, JobConflictError
+from .utils.InteractionBuffer import InteractionBuffer
 
 from .databases.Interest import InterestDatabase
 from .databases.ArticleRag import RagDatabase
 from .databases.Bookmarks import BookmarkDatabase
 from .databases.Workspace import WorkspaceDatabase
+from .databases.Storage import close_all
 
 from .query import Query
 
@@ -41,13 +49,68 @@ app.add_middleware(
 # load application specific classes
 config = ServerConfig()
 
-rag_db = RagDatabase()
+digest_cache = DailyDigestCache(ttl=config.daily_news["cache_ttl"], active_window=config.daily_news["active_window"])
+
+rag_db = RagDatabase(config)
 workspace_db = WorkspaceDatabase(rag_db)
-interest_db = InterestDatabase(config, rag_db=rag_db)
-bookmark_db = BookmarkDatabase(rag_db)
+interest_db = InterestDatabase(config, rag_db=rag_db, digest_cache=digest_cache)
+# clicks and bookmarks are acknowledged right away and applied to the interest profile in batches
+interaction_buffer = None
+if config.interactions["write_behind"]:
+    interaction_buffer = InteractionBuffer(
+        interest_db,
+        flush_interval=config.interactions["flush_interval"],
+        flush_size=config.interactions["flush_size"],
+        log_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "../database/interactions.log") if config.interactions["durable_log"] else None,
+        fsync=config.interactions["fsync"]
+    )
+# bookmark status of returned articles is cached per workspace, add and delete keep it current
+bookmark_db = BookmarkDatabase(rag_db, cache_status=True)
+
+rag_query = Query(config=config, rag_db=rag_db, interest_db=interest_db, bookmark_db=bookmark_db, digest_cache=digest_cache)
+# ingestion started from the api runs as background jobs, the model summarizes and tags new articles
+data_fetcher = DataFetcher(load_model=True, model=config.ingestion["job_model"], rag_db=rag_db, config=config)
+job_manager = JobManager(data_fetcher, max_jobs=config.ingestion["max_jobs"], history_size=config.ingestion["job_history"])
+
+# blocking database and model work of the routes runs on a bounded thread pool, limited per route group
+ROUTE_GROUPS = ["query", "daily_news", "interaction", "bookmark", "workspace", "database"]
+request_executor = RequestExecutor(
+    max_workers=config.server["worker_threads"],
+    route_limits={group: config.server[f"{group}_concurrency"] for group in ROUTE_GROUPS}
+)
+
+# event loop of the server, set on startup so ingestion threads can schedule work on it
+main_loop = None
+
+def on_articles_ingested():
+    # new articles change every digest and cached query response, drop them and precompute digests for active workspaces
+    digest_cache.invalidate_all()
+    if rag_query.response_cache:
+        rag_query.response_cache.invalidate_all()
+    if main_loop:
+        asyncio.run_coroutine_threadsafe(rag_query.warm_daily_digests(), main_loop)
+
+data_fetcher.add_ingest_listener(on_articles_ingested)
+
+
+@app.on_event("startup")
+async def startup():
+    global main_loop
+    main_loop = asyncio.get_running_loop()
+    request_executor.install(main_loop)
 
-rag_query = Query(config=config, rag_db=rag_db, interest_db=interest_db, bookmark_db=bookmark_db)
-data_fetcher = DataFetcher(load_model=False, rag_db=rag_db)
+@app.on_event("shutdown")
+async def shutdown():
+    # release pooled connections of the async model client
+    await rag_query.model.close()
+    rag_query.http_client.close()
+    job_manager.shutdown()
+    # apply buffered interactions before the database connections close
+    if interaction_buffer:
+        interaction_buffer.shutdown()
+    # every sqlite storage, including the completion cache
+    close_all()
+    request_executor.shutdown()
 
 
 ############ Routes ############
@@ -61,7 +124,7 @@ async def root():
 @app.get("/api/daily_news/{user_id}/{workspace_id}")
 async def daily_news(user_id: str, workspace_id: str):
     api_logger.info("Received Daily News Request")
-    response = rag_query.daily_recommendation(user_id=user_id, workspace_id=workspace_id)
+    response = await request_executor.run("daily_news", rag_query.daily_recommendation, user_id=user_id, workspace_id=workspace_id)
     api_logger.info(f"Response: {response}")
     return response
 
@@ -77,12 +140,31 @@ class QueryRequest(pydantic.BaseModel):
 async def query(request: QueryRequest):
     api_logger.info(f"Received Query: {request}")
     
-    response = rag_query.generate_response(request.query, context=request.context, quote=request.quote, user_id=request.user_id, workspace_id=request.workspace_id, recommended_news_ids=request.news_ids)
+    response = await request_executor.run("query", rag_query.generate_response, request.query, context=request.context, quote=request.quote, user_id=request.user_id, workspace_id=request.workspace_id, recommended_news_ids=request.news_ids)
     
     api_logger.info(f"Response: {response}")
     return response
 
 
+# streaming variant of /api/query as server-sent events:
+# "articles" once ranking is done, then "summary" text chunks, then "done"
+@app.post("/api/query/stream")
+async def query_stream(request: QueryRequest):
+    api_logger.info(f"Received Streaming Query: {request}")
+    
+    async def event_stream():
+        try:
+            # the query slot is held until the last summary chunk is sent
+            async with request_executor.limit("query"):
+                async for event, data in rag_query.stream_response(request.query, context=request.context, quote=request.quote, user_id=request.user_id, workspace_id=request.workspace_id, recommended_news_ids=request.news_ids):
+                    yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            api_logger.error(f"Error streaming query response: {e}")
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+    
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
 ############ User ############
 @app.get("/api/user")
 async def get_user_id():
@@ -95,7 +177,7 @@ async def get_user_id():
 @app.get("/api/workspaces/{user_id}")
 async def get_workspaces(user_id: str):
     api_logger.info(f"Received Get Workspaces Request: {user_id}")
-    workspaces = workspace_db.get_workspaces_by_user_id(user_id)
+    workspaces = await request_executor.run("workspace", workspace_db.get_workspaces_by_user_id, user_id)
     api_logger.info(f"Response: {workspaces}")
     return workspaces
 
@@ -103,29 +185,37 @@ async def get_workspaces(user_id: str):
 @app.post("/api/workspace/{user_id}/{workspace_name}")
 async def create_workspace(user_id: str, workspace_name: str):
     api_logger.info(f"Received Create Workspace Request: {user_id}, {workspace_name}")
-    result = workspace_db.add_workspace(user_id, workspace_name)
+    result = await request_executor.run("workspace", workspace_db.add_workspace, user_id, workspace_name)
     api_logger.info(f"Response: {result}")
     return result
 
 @app.delete("/api/workspace/{user_id}/{workspace_name}")
 async def delete_workspace(user_id: str, workspace_name: str):
     api_logger.info(f"Received Create Workspace Request: {user_id}, {workspace_name}")
-    result = workspace_db.delete_workspace(user_id, workspace_name)
+    result = await request_executor.run("workspace", workspace_db.delete_workspace, user_id, workspace_name)
     api_logger.info(f"Response: {result}")
     return result
 
 ############ User Interest ############
+async def record_interaction(article_id, user_id, workspace_id, interaction):
+    if interaction_buffer:
+        # appended to the buffer and its log, tag scores are updated by the next flush;
+        # the log write (and fsync) runs on the executor, not on the event loop
+        await request_executor.run("interaction", interaction_buffer.add, article_id, user_id, workspace_id, interaction)
+    else:
+        await request_executor.run("interaction", interest_db.interact_with_article, article_id, user_id, workspace_id, interaction)
+
 # user clicks on an article link
 @app.post("/api/click_article/{user_id}/{workspace_id}/{article_id}")
 async def read_article(user_id: str, workspace_id: str, article_id: str):
     api_logger.info(f"Received Click Article Request: {article_id}")
-    interest_db.interact_with_article(article_id, interaction="click", user_id=user_id, workspace_id=workspace_id)
+    await record_interaction(article_id, user_id, workspace_id, "click")
 
 # get top n tags of workspace
 @app.get("/api/interests/{user_id}/{workspace_id}")
 async def get_interests(user_id: str, workspace_id: str):
     api_logger.info(f"Received Get Interests Request: {workspace_id}")
-    interests = interest_db.get_top_tags(user_id=user_id, workspace_id=workspace_id)
+    interests = await request_executor.run("interaction", interest_db.get_top_tags, user_id=user_id, workspace_id=workspace_id)
     api_logger.info(f"Response: {interests}")
     return interests
 
@@ -133,7 +223,10 @@ async def get_interests(user_id: str, workspace_id: str):
 @app.delete("/api/interests/{workspace_id}")
 async def reset_interests(workspace_id: str):
     api_logger.info(f"Received Reset Interests Request: {workspace_id}")
-    interest_db.reset_user_profile(workspace_id=workspace_id)
+    # buffered events of the workspace would otherwise be applied after the reset
+    if interaction_buffer:
+        await request_executor.run("interaction", interaction_buffer.discard_workspace, workspace_id)
+    await request_executor.run("interaction", interest_db.reset_workspace_profile, workspace_id=workspace_id)
     return {"message": "Interests reset successfully"}
 
 
@@ -141,7 +234,9 @@ async def reset_interests(workspace_id: str):
 @app.delete("/api/interests")
 async def reset_database():
     api_logger.info("Received Reset Database Request")
-    interest_db.clear_database()
+    if interaction_buffer:
+        await request_executor.run("interaction", interaction_buffer.clear)
+    await request_executor.run("interaction", interest_db.clear_database)
     return {"message": "Database reset successfully"}
 
 
@@ -150,9 +245,9 @@ async def reset_database():
 @app.post("/api/bookmark/{user_id}/{workspace_id}/{article_id}")
 async def add_bookmark(user_id: str, workspace_id: str, article_id: str):
     api_logger.info(f"Received Add Bookmark Request: {article_id}")
-    bookmark = bookmark_db.add_bookmark(article_id, user_id, workspace_id) 
+    bookmark = await request_executor.run("bookmark", bookmark_db.add_bookmark, article_id, user_id, workspace_id)
     
-    interest_db.interact_with_article(article_id, user_id, workspace_id, "bookmark")
+    await record_interaction(article_id, user_id, workspace_id, "bookmark")
     api_logger.info(f"Response: {bookmark}")
     return bookmark
 
@@ -160,7 +255,7 @@ async def add_bookmark(user_id: str, workspace_id: str, article_id: str):
 @app.get("/api/bookmarks/{user_id}/{workspace_id}")
 async def get_bookmarks(user_id: str, workspace_id: str):
     api_logger.info("Received Get Bookmark Request")
-    bookmarks = bookmark_db.get_all_bookmarks(user_id, workspace_id)
+    bookmarks = await request_executor.run("bookmark", bookmark_db.get_all_bookmarks, user_id, workspace_id)
     api_logger.info(f"Response: {bookmarks}")
     return bookmarks
 
@@ -169,21 +264,21 @@ async def get_bookmarks(user_id: str, workspace_id: str):
 @app.delete("/api/bookmark/{bookmark_id}")
 async def delete_bookmark(bookmark_id: str):
     api_logger.info(f"Received Delete Bookmark Request: {bookmark_id}")
-    result = bookmark_db.delete_bookmark(bookmark_id)
+    result = await request_executor.run("bookmark", bookmark_db.delete_bookmark, bookmark_id)
     return result
 
 # delete bookmark by workspace and article id
 @app.delete("/api/bookmark/{user_id}/{workspace_id}/{article_id}")
 async def delete_bookmark_by_article(user_id: str, workspace_id: str, article_id: str):
     api_logger.info(f"Received Delete Bookmark by Article Request: {article_id}")
-    bookmark = bookmark_db.delete_bookmark_by_article(article_id, user_id, workspace_id)
+    bookmark = await request_executor.run("bookmark", bookmark_db.delete_bookmark_by_article, article_id, user_id, workspace_id)
     api_logger.info(f"Response: {bookmark}")
     return bookmark
 
 @app.delete("/api/bookmark/all/{user_id}/{workspace_id}")
 async def delete_all_bookmarks(user_id: str, workspace_id: str):
     api_logger.info(f"Received Delete All Bookmark Request: {user_id}, {workspace_id}")
-    bookmark = bookmark_db.delete_all_bookmarks(user_id, workspace_id)
+    bookmark = await request_executor.run("bookmark", bookmark_db.delete_all_bookmarks, user_id, workspace_id)
     api_logger.info(f"Response: {bookmark}")
     return bookmark
 
@@ -197,27 +292,56 @@ async def get_config():
     return config_data
 
 ############ News Database Management ############
-# fetch data from newsapi to update the database
+# fetch data from newsapi to update the database, runs as a background job
 @app.post("/api/database/update")
-async def fetch_data(fetchType: str, hours_count: int = None):
-    if fetchType == "headline":
-        data_fetcher.fetch_data(fetch_type="headline")
-    elif fetchType == "everything":
-        data_fetcher.fetch_data(fetch_type="everything", hours_count=hours_count)
+async def fetch_data(fetchType: str, hours_count: int = 12, start_datetime: str = None, end_datetime: str = None, since_last: bool = False, resume: bool = False):
+    api_logger.info(f"Received Database Update Request: {fetchType}, {hours_count}, {start_datetime} - {end_datetime}")
+    if fetchType not in ["headline", "everything"]:
+        raise fastapi.HTTPException(status_code=400, detail=f"Invalid fetch type: {fetchType}")
+    
+    try:
+        job = await request_executor.run("database", job_manager.submit, fetchType, hours_count=hours_count, start_datetime=start_datetime, end_datetime=end_datetime, since_last=since_last, resume=resume)
+    except JobConflictError as e:
+        raise fastapi.HTTPException(status_code=409, detail={"message": str(e), "job": e.job.to_dict()})
+    except ValueError as e:
+        # malformed start_datetime / end_datetime
+        raise fastapi.HTTPException(status_code=400, detail=str(e))
     
-    return {"message": "Data fetched successfully"}
+    api_logger.info(f"Response: {job.job_id}")
+    return {"message": "Data fetch started", "job": job.to_dict()}
+
+# status and progress of ingestion jobs
+@app.get("/api/database/jobs")
+async def get_jobs():
+    return [job.to_dict() for job in job_manager.list()]
+
+@app.get("/api/database/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise fastapi.HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+# cancel a queued or running job, finished articles stay and the window can be resumed
+@app.delete("/api/database/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    api_logger.info(f"Received Cancel Job Request: {job_id}")
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise fastapi.HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
 
 # get database summary
 @app.get("/api/database/summary")
 async def get_database_summary():
     # create a data fetcher object
-    return rag_db.show_db_summary()
+    return await request_executor.run("database", rag_db.show_db_summary)
 
 # clear database
 @app.post("/api/database/reset")
 async def reset_database():
     # create a data fetcher object
-    return rag_db.reset_database()
+    return await request_executor.run("database", rag_db.reset_database)
 
 
 
@@ -1,22 +1,29 @@
 import os
 import time
+import threading
 import argparse
-import requests
 from nltk.stem import WordNetLemmatizer
+from nltk.corpus import wordnet
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from newsplease import NewsPlease
 
 from ..databases.ArticleRag import RagDatabase
+from ..models.CompletionCache import get_completion_cache
 from .Logger import setup_logger 
+from .ServerConfig import ServerConfig
+from .IngestionPipeline import IngestionPipeline, Stage
+from .HttpClient import HttpRequestError, get_http_client, news_api_url
+from .IngestionJournal import IngestionJournal
 
 
 # initial setup
 load_dotenv()
 os.environ["CUDA_LAUNCH_BLOCKING"] = "1"
 class DataFetcher:
-    def __init__(self, rag_db=None, load_model=False, model="ust"):        
+    def __init__(self, rag_db=None, load_model=False, model="ust", config=None):        
         self.logger = setup_logger("dataFetcher", "dataFetcher")
+        self.config = config if config else ServerConfig()
         
         self.logger.info(f"Starting DataFetcher with model {model}, rag_db {rag_db} and load_model {load_model}.")
         
@@ -24,156 +31,433 @@ class DataFetcher:
         if rag_db:
             self.db = rag_db
         else:
-            self.db = RagDatabase()
+            self.db = RagDatabase(self.config)
         
         # load LLM for generating tags and summary
         if load_model:
+            # completions are shared with the server, so re-running a page reuses its summaries
+            completion_cache = get_completion_cache(self.config)
             if model == "ust":
                 from ..models.USTModelClient import USTModelClient
-                self.model = USTModelClient()
+                self.model = USTModelClient(cache=completion_cache)
             elif model == "hf":
                 from ..models.HuggingFaceModelClient import  HuggingFaceModelClient
-                self.model = HuggingFaceModelClient()
+                self.model = HuggingFaceModelClient(cache=completion_cache, quantize=self.config.model["hf_quantize"])
             elif model == "ollama":
                 from ..models.OllamaModelClient import OllamaModelClient
-                self.model = OllamaModelClient() 
+                self.model = OllamaModelClient(cache=completion_cache) 
             else:
                 self.logger.error(f"Model {model} not supported. Please choose from ust, hf, ollama.")
                 self.model = None
         else:
             self.model = None
         
-        # word lemmatizer for tags processing
+        # pooled session with timeouts and retries, shared with the query routes
+        self.http_client = get_http_client(self.config)
+        
+        # word lemmatizer for tags processing, shared by the summarize workers;
+        # the corpus loads lazily and is not thread-safe, so load it before any worker starts
         self.lemmatizer = WordNetLemmatizer()
+        wordnet.ensure_loaded()
+        
+        # callbacks run after an ingestion run stored new articles, e.g. cache invalidation
+        self.ingest_listeners = []
+        
+        # articles waiting to be inserted in one batch
+        self.insert_buffer = []
+        self.insert_lock = threading.Lock()
+        # window -> {"stored": n, "failed": n} written by flush_articles, the insert stage only buffers
+        self.insert_counts = {}
+        
+        # status of every window, page and article of past runs, used to resume
+        cur_path = os.path.dirname(os.path.abspath(__file__))
+        self.journal = IngestionJournal(f"{cur_path}/../../database/NewsAgent.db")
         
 
     '''
     News Fetching functions
     '''
     # fetch news article from newsapi
-    def request_data(self, url):
-        # Send a GET request to the API
-        response = requests.get(url)
-
-        # check response
-        if response.status_code != 200:
-            self.logger.error(f"Error fetching data: {response.status_code}")
-            return None
-
-        # Parse the response JSON data
-        data = response.json()
+    def request_data(self, url, params=None):
+        # raises HttpRequestError once retries are exhausted
+        data = self.http_client.get_json(url, params=params)
         total_results = data.get("totalResults", 0)
         self.logger.info(f"fetched {total_results} articles, actually received {len(data.get('articles', []))}")
 
         # Return the parsed data
         return data, total_results
 
+    # record the status of an article in the journal, window is (window_id, page) or None
+    def record_item(self, window, url, status, error=None):
+        if window:
+            window_id, page = window
+            self.journal.set_item_status(window_id, url, status, page=page, error=error)
+
+    # stage 1: crawl full article text
+    def crawl_article(self, article, fetch_date, window=None):
+        start_time = time.time()
+        try:
+            full_article = NewsPlease.from_url(article['url'])
+            self.logger.info(f"Fetched full article: {article['title']} [url= {article['url']}")
+        except Exception as e:
+            self.logger.error(f"Error crawling full article: {str(e)}")
+            self.record_item(window, article['url'], "failed", error=f"crawl: {e}")
+            return None
+
+        # skip if article maintext is empty / None or larger than 4000 tokens
+        if not full_article.maintext or len(full_article.maintext) > 4000:
+            self.logger.info(f"Article maintext is empty or too large: {article['title']} [url= {article['url']}")
+            self.record_item(window, article['url'], "skipped")
+            return None
+
+        self.record_item(window, article['url'], "crawled")
+        return {
+            "article": article,
+            "maintext": full_article.maintext,
+            "fetch_date": fetch_date,
+            "start_time": start_time,
+            "window": window
+        }
+
+    # stage 2: generate summary and tags with the LLM
+    def summarize_article(self, item):
+        article = item["article"]
+        try:
+            text, tags = self.generate_summary(title=article['title'], content=item["maintext"])
+        except Exception as e:
+            self.logger.error(f"Error summarizing article: {str(e)}")
+            self.record_item(item["window"], article['url'], "failed", error=f"summarize: {e}")
+            return None
+
+        item["text"] = text
+        item["tags"] = tags
+        self.record_item(item["window"], article['url'], "summarized")
+        return item
+
+    # stage 2, batched: one batched generation for several articles, used with local models
+    def summarize_articles(self, items):
+        try:
+            results = self.generate_summaries(
+                titles=[item["article"]["title"] for item in items],
+                contents=[item["maintext"] for item in items]
+            )
+        except Exception as e:
+            self.logger.error(f"Error summarizing {len(items)} articles: {str(e)}")
+            for item in items:
+                self.record_item(item["window"], item["article"]["url"], "failed", error=f"summarize: {e}")
+            return [None] * len(items)
+
+        summarized = []
+        for item, result in zip(items, results):
+            if result is None:
+                self.record_item(item["window"], item["article"]["url"], "failed", error="summarize: no response")
+                summarized.append(None)
+                continue
+            item["text"], item["tags"] = result
+            self.record_item(item["window"], item["article"]["url"], "summarized")
+            summarized.append(item)
+        return summarized
+
+    # stage 3: store summary of article instead of full article
+    def store_article(self, item):
+        article = item["article"]
+        metadata = {
+            "title": article['title'],
+            "description": article.get("description", "Unknown"),
+            "url": article['url'],
+            "fetch_date": item["fetch_date"],
+            "publish_date": article.get("publishedAt", "Unknown"),
+            "source": article.get("source", {}).get("name", "Unknown"),
+            "tags": item["tags"],
+        }
+
+        # buffer articles and write them to the database in batches
+        with self.insert_lock:
+            self.insert_buffer.append((item["text"], metadata, item["start_time"], item["window"]))
+            buffer_full = len(self.insert_buffer) >= self.config.ingestion["insert_batch_size"]
+        
+        if buffer_full:
+            self.flush_articles()
+
+        return item
+    
+    # write all buffered articles to the database
+    def flush_articles(self):
+        with self.insert_lock:
+            buffer = self.insert_buffer
+            self.insert_buffer = []
+        
+        if not buffer:
+            return []
+        
+        documents = [text for text, _, _, _ in buffer]
+        metadatas = [metadata for _, metadata, _, _ in buffer]
+        try:
+            results = self.db.insert_articles(documents, metadatas, batch_size=self.config.ingestion["insert_batch_size"])
+        except Exception as e:
+            self.logger.error(f"Error storing articles: {str(e)}")
+            results = [False] * len(buffer)
+        
+        for (_, metadata, start_time, window), success in zip(buffer, results):
+            if success:
+                self.logger.info(f"Added article into database using {time.time() - start_time} seconds: {metadata['title']}")
+                self.record_item(window, metadata['url'], "stored")
+            else:
+                self.logger.error(f"Error storing article: {metadata['title']} [url= {metadata['url']}]")
+                self.record_item(window, metadata['url'], "failed", error="insert")
+            
+            with self.insert_lock:
+                counts = self.insert_counts.setdefault(window, {"stored": 0, "failed": 0})
+                counts["stored" if success else "failed"] += 1
+        
+        return results
+
+    # crawl stage of a page, stops taking new articles once the run is cancelled
+    def crawl_stage(self, fetch_date, window=None, cancel_event=None):
+        def crawl(article):
+            # articles already being summarized or inserted still finish
+            if cancel_event and cancel_event.is_set():
+                return None
+            return self.crawl_article(article, fetch_date, window)
+        return crawl
+    
     # handles full processing of articles
-    def fetch_and_store_articles(self, data):
-        # Convert articles to text format
+    # window is (window_id, page) of the journal, None to run without checkpoints
+    def fetch_and_store_articles(self, data, window=None, cancel_event=None):
         fetch_date = int(datetime.now().timestamp())
-        
-        self.logger.info(f"Starting to insert {len(data['articles'])} articles into database.")
 
+        # drop articles already in db (and repeats within the page) before any crawling starts
+        new_urls = set(self.db.filter_new_urls([article['url'] for article in data['articles']]))
+        # and articles an earlier run of the window stored or skipped
+        if window:
+            new_urls -= self.journal.done_urls(window[0], list(new_urls))
+        articles = []
         for article in data['articles']:
-            # check if article is in db
-            if  self.db.article_exist(article['url']):
+            if article['url'] in new_urls:
+                articles.append(article)
+                new_urls.discard(article['url'])
+            else:
                 self.logger.info(f"Article already in database: {article['title']} [url= {article['url']}")
-                continue
-            
-            start_time = time.time()
-            # store summary of article instead of full article
-            try:
-                full_article = NewsPlease.from_url(article['url'])
-                self.logger.info(f"Fetched full article: {article['title']} [url= {article['url']}")
-                
-                # skip if article maintext is empty / None or larger than 4000 tokens
-                if not full_article.maintext or len(full_article.maintext) > 4000:
-                    self.logger.info(f"Article maintext is empty or too large: {article['title']} [url= {article['url']}")
-                    text = article.get("description", "Unknown")
-                    tags = []
-                    continue
-                
-                text, tags = self.generate_summary(title=article['title'], content=full_article.maintext)
 
-            except Exception as e:
-                self.logger.error(f"Error crawling full article: {str(e)}")
-                text = article.get("description", "Unknown")
-                tags = []
-                continue
-                
+        self.logger.info(f"Starting to insert {len(articles)} of {len(data['articles'])} articles into database.")
 
-            metadata = {
-                "title": article['title'],
-                "description": article.get("description", "Unknown"),
-                "url": article['url'],
-                "fetch_date": fetch_date,
-                "publish_date": article.get("publishedAt", "Unknown"),
-                "source": article.get("source", {}).get("name", "Unknown"),
-                "tags": str(tags),
-            }
-            
-            try:
-                self.db.insert_article(document=text, metadata=metadata)
-                
-                self.logger.info(f"Added article into database using {time.time() - start_time} seconds: {article['title']}")
-            except Exception as e:
-                self.logger.error(f"Error storing article: {str(e)}")
-                
-                continue
+        # crawl (network bound), summarize (LLM bound) and insert run as separate worker pools
+        ingestion_config = self.config.ingestion
+        queue_size = ingestion_config["queue_size"]
+        # no model (e.g. --model none) fails each article in the summarize stage, as the per-article path does
+        if getattr(self.model, "supports_batching", False) and ingestion_config["summarize_batch_size"] > 1:
+            # a local model batches prompts itself, a single worker keeps it from being shared across threads
+            summarize_stage = Stage("summarize", self.summarize_articles, 1, queue_size, batch_size=ingestion_config["summarize_batch_size"])
+        else:
+            summarize_stage = Stage("summarize", self.summarize_article, ingestion_config["summarize_workers"], queue_size)
+
+        pipeline = IngestionPipeline([
+            Stage("crawl", self.crawl_stage(fetch_date, window, cancel_event), ingestion_config["crawl_workers"], queue_size),
+            summarize_stage,
+            Stage("insert", self.store_article, ingestion_config["insert_workers"], queue_size),
+        ], logger=self.logger)
+
+        report = pipeline.run(articles)
+        
+        # flush the remaining articles at the page boundary
+        self.flush_articles()
+        
+        # the insert stage counts buffered articles, report what the batch inserts actually stored
+        with self.insert_lock:
+            counts = self.insert_counts.pop(window, {"stored": 0, "failed": 0})
+        for entry in report:
+            if entry["stage"] == "insert":
+                entry["processed"] = counts["stored"]
+                entry["failed"] += counts["failed"]
+                entry["throughput"] = round(counts["stored"] / entry["elapsed"], 3) if entry["elapsed"] > 0 else 0.0
+        return report
     
-    # Entry point for fetching data
-    def fetch_data(self, fetch_type="everything", hours_count=12, start_page=1):
-        self.logger.info(f"Fetching {fetch_type} data for the last {hours_count} hours.")
-        # Get the API key from environment variables
-        API_KEY = os.getenv("NEWS_API_KEY")
+    # window fetch_data covers for the given arguments, as ISO strings (start_datetime, end_datetime)
+    def resolve_window(self, fetch_type="everything", hours_count=12, start_datetime=None, end_datetime=None, since_last=False, resume=False):
+        # same format as the journal, so windows compare and match across runs
+        if start_datetime:
+            start_datetime = datetime.fromisoformat(start_datetime).isoformat(timespec="seconds")
+        if end_datetime:
+            end_datetime = datetime.fromisoformat(end_datetime).isoformat(timespec="seconds")
+        
+        if resume:
+            unfinished = self.journal.last_unfinished_window(fetch_type)
+            if unfinished:
+                start_datetime, end_datetime = unfinished
+            else:
+                self.logger.info(f"No unfinished {fetch_type} window to resume.")
         
         if (fetch_type == "headline"):
-            base_url = f"https://newsapi.org/v2/top-headlines?category=technology&apiKey={API_KEY}&pageSize=100"
+            # headlines have no time range, runs within the same hour share a window
+            if not start_datetime:
+                start_datetime = end_datetime = datetime.now().replace(minute=0, second=0, microsecond=0).isoformat(timespec="seconds")
        
         else:
             # API has 24 hour delay, so have to fetch at least one day ahead 
             # since we are fetching from us, cater the timezone difference too
-            end_datetime = datetime.now() - timedelta(days=1) - timedelta(hours=12)
-            start_datetime = (end_datetime - timedelta(hours=hours_count))
+            if not end_datetime:
+                end_datetime = (datetime.now() - timedelta(days=1) - timedelta(hours=12)).isoformat(timespec="seconds")
             
-            # Convert the datetime objects to ISO format strings
-            end_datetime = end_datetime.isoformat()
-            start_datetime = start_datetime.isoformat()
+            if not start_datetime and since_last:
+                start_datetime = self.journal.last_completed_end(fetch_type)
+                if start_datetime:
+                    self.logger.info(f"Fetching the delta since the last completed window, which ended at {start_datetime}.")
+            if not start_datetime:
+                start_datetime = (datetime.fromisoformat(end_datetime) - timedelta(hours=hours_count)).isoformat(timespec="seconds")
+        
+        return start_datetime, end_datetime
+    
+    # Entry point for fetching data
+    def fetch_data(self, fetch_type="everything", hours_count=12, start_page=1, start_datetime=None, end_datetime=None, since_last=False, resume=False, progress=None, cancel_event=None):
+        """
+        :param start_datetime, end_datetime: ISO strings of the window to fetch, defaults to the last hours_count hours
+        :param since_last: start where the last completed window of this fetch type ended
+        :param resume: re-run the latest window that did not complete
+        :param progress: callable taking keyword updates (window_id, page_count, pages_completed, pages_failed, items, stage_totals)
+        :param cancel_event: threading.Event, once set no new page or article is started
+        :return: result of fetch_window
+        Re-running a window skips pages and articles the journal records as done.
+        """
+        # Get the API key from environment variables
+        API_KEY = os.getenv("NEWS_API_KEY")
+        
+        start_datetime, end_datetime = self.resolve_window(fetch_type, hours_count, start_datetime, end_datetime, since_last, resume)
+        
+        if (fetch_type == "headline"):
+            base_url = f"{news_api_url()}/top-headlines"
+            params = {"category": "technology", "apiKey": API_KEY, "pageSize": 100}
+        
+        else:
+            if start_datetime >= end_datetime:
+                self.logger.info(f"Nothing to fetch, window {start_datetime} - {end_datetime} is empty.")
+                return {"window_id": None, "status": "completed", "error": None, "stage_totals": {}}
             
-            base_url = f"https://newsapi.org/v2/everything?q=technology&language=en&from={start_datetime}&to={end_datetime}&apiKey={API_KEY}&pageSize=100"
+            base_url = f"{news_api_url()}/everything"
+            params = {"q": "technology", "language": "en", "from": start_datetime, "to": end_datetime, "apiKey": API_KEY, "pageSize": 100}
+
+        self.logger.info(f"Fetching {fetch_type} data from {start_datetime} to {end_datetime}.")
+        window_id = self.journal.start_window(fetch_type, start_datetime, end_datetime)
+        # an unexpected error must not leave the window running in the journal
+        try:
+            return self.fetch_window(window_id, base_url, params, start_page, progress, cancel_event)
+        except Exception:
+            self.journal.finish_window(window_id, "partial")
+            raise
+    
+    def fetch_window(self, window_id, base_url, params, start_page=1, progress=None, cancel_event=None):
+        """
+        Fetch, summarize and store every page of a journal window not completed yet.
+        :return: dict with the window status ("completed", "partial" or "failed"), error message and per-stage totals
+        """
+        completed_pages = self.journal.completed_pages(window_id)
+        if completed_pages:
+            self.logger.info(f"Resuming window {window_id}, skipping completed pages {sorted(completed_pages)}.")
 
         # Fetch data from newsapi
         try:
-            data, total_results = self.request_data(base_url)
+            first_page, total_results = self.request_data(base_url, params={**params, "page": 1})
             self.logger.info(f"Fetched {total_results} articles from newsapi.")
-        except Exception as e:
+        except HttpRequestError as e:
             self.logger.error(f"Error fetching data from newsapi: {str(e)}")
-            return
+            self.journal.finish_window(window_id, "partial")
+            return {"window_id": window_id, "status": "failed", "error": f"Error fetching data from newsapi: {str(e)}", "stage_totals": {}}
         
         if total_results == 0:
             self.logger.error("No articles found.")
-            return
+            self.journal.finish_window(window_id, "completed")
+            return {"window_id": window_id, "status": "completed", "error": None, "stage_totals": {}}
         
         page_count = (total_results - 1) // 100 + 1
         # temp: try 3 pages first
         # page_count = min(page_count, 3)
-        for page in range(start_page, page_count + 1):
+        
+        # fetch the remaining pages concurrently, page 1 is reused
+        pages = [page for page in range(start_page, page_count + 1) if page not in completed_pages]
+        pages_completed = len(completed_pages)
+        pages_failed = 0
+        if progress:
+            progress(window_id=window_id, page_count=page_count, pages_completed=pages_completed, pages_failed=pages_failed)
+        responses = self.http_client.get_json_many(
+            [(base_url, {**params, "page": page}) for page in pages if page != 1],
+            workers=self.config.http["page_workers"]
+        )
+        responses = iter(responses)
+        
+        stage_totals = {}
+        start_time = time.time()
+        for page in pages:
+            if cancel_event and cancel_event.is_set():
+                self.logger.info(f"Ingestion of window {window_id} cancelled before page {page}.")
+                break
+            
+            data = first_page if page == 1 else next(responses)
+            # a failed page is skipped instead of aborting the run
+            if isinstance(data, HttpRequestError):
+                self.logger.error(f"Error fetching page {page} from newsapi: {str(data)}")
+                self.journal.set_page_status(window_id, page, "failed")
+                pages_failed += 1
+                if progress:
+                    progress(pages_failed=pages_failed)
+                continue
+            self.logger.info(f"Fetched {len(data['articles'])} articles from page {page}.")
+            self.journal.set_page_status(window_id, page, "fetched", article_count=len(data['articles']))
+            
+            report = self.fetch_and_store_articles(data, window=(window_id, page), cancel_event=cancel_event)
+            
+            # a page with failed articles is retried on the next run of the window,
+            # so is a cancelled one, its skipped articles have no journal entry
+            page_failed = any(entry["failed"] for entry in report) or self.journal.pending_count(window_id, page) > 0 \
+                or (cancel_event is not None and cancel_event.is_set())
+            self.journal.set_page_status(window_id, page, "partial" if page_failed else "completed")
+            
+            for entry in report:
+                totals = stage_totals.setdefault(entry["stage"], {"processed": 0, "dropped": 0, "failed": 0})
+                for key in totals:
+                    totals[key] += entry[key]
+            
+            if page_failed:
+                pages_failed += 1
+            else:
+                pages_completed += 1
+            if progress:
+                progress(pages_completed=pages_completed, pages_failed=pages_failed, items=self.journal.item_counts(window_id), stage_totals=stage_totals)
+        
+        # pages before start_page only count if an earlier run completed them
+        window_completed = set(range(1, page_count + 1)) <= self.journal.completed_pages(window_id)
+        status = "completed" if window_completed else "partial"
+        self.journal.finish_window(window_id, status)
+        self.logger.info(f"Window {window_id} {status}, items: {self.journal.item_counts(window_id)}")
+        
+        # report per-stage throughput over the whole run
+        elapsed = time.time() - start_time
+        for stage, totals in stage_totals.items():
+            throughput = totals["processed"] / elapsed if elapsed > 0 else 0
+            self.logger.info(f"Stage {stage} total: {totals}, throughput={throughput:.3f} articles/s over {elapsed:.1f}s")
+        
+        if stage_totals.get("insert", {}).get("processed", 0) > 0:
+            self.notify_ingested()
+        
+        error = None
+        if pages_failed:
+            error = f"{pages_failed} of {page_count} pages failed or have failed articles, re-run the window to retry them"
+        return {"window_id": window_id, "status": status, "error": error, "stage_totals": stage_totals}
+    
+    def add_ingest_listener(self, listener):
+        self.ingest_listeners.append(listener)
+    
+    def notify_ingested(self):
+        for listener in self.ingest_listeners:
             try:
-                data, _ = self.request_data(base_url + f"&page={page}")
-                self.logger.info(f"Fetched {len(data['articles'])} articles from page {page}.")
+                listener()
             except Exception as e:
-                self.logger.error(f"Error fetching data from newsapi: {str(e)}")
-                return
-            self.fetch_and_store_articles(data)
+                self.logger.error(f"Ingest listener failed: {str(e)}")
     
     
     '''
     Use LLM to generate summary and tags for articles
     '''
-    # generate summary and tags from raw article
-    def generate_summary(self, title, content):
-        prompt = (
+    def build_summary_prompt(self, title, content):
+        return (
             f"Generate a 150-word summary and 5 category tags for the following news article. "
             f"Focus on the key points from the title and content, keeping it concise and informative.\n\n"
             f"Title: {title}\n"
@@ -181,8 +465,8 @@ class DataFetcher:
             f"Return the summary enclosed by the tags <summary></summary>\n"
             f"Return the category tags enclosed by <tags></tags> and separated by comma. Example: <tags>AI,healthcare,gaming,Nintendo,Xbox</tags>\n"
         )
-        
-        response = self.model.get_model_response(prompt)
+
+    def parse_summary_response(self, title, response):
         response = response.replace("Tags", "tags")
         
         self.logger.info(f"Response from model: {response}")
@@ -205,6 +489,22 @@ class DataFetcher:
         self.logger.info(f"Generated tags {tags} and summary for {title}:\n{summary}")
         return summary, tags
 
+    # generate summary and tags from raw article
+    def generate_summary(self, title, content):
+        response = self.model.get_model_response(self.build_summary_prompt(title, content))
+        return self.parse_summary_response(title, response)
+
+    # summaries and tags of many articles, batched on local models
+    # returns (summary, tags) per article in order, None where generation failed
+    def generate_summaries(self, titles, contents):
+        prompts = [self.build_summary_prompt(title, content) for title, content in zip(titles, contents)]
+        responses = self.model.get_model_responses(prompts, batch_size=self.config.ingestion["summarize_batch_size"], task="summary")
+        
+        return [
+            self.parse_summary_response(title, response) if response else None
+            for title, response in zip(titles, responses)
+        ]
+
     # generate tags from news summary
     def generate_tags_from_summary(self, summary):
         # Generate tags from the summary using the model
@@ -244,15 +544,6 @@ class DataFetcher:
             self.logger.info("No documents with missing 'tags' field found.")
             return
         
-        result = [
-            {
-                "id": doc[0],
-                "document": doc[1],
-                "metadata": doc[2]
-            }
-            for doc in zip(result['ids'], result['documents'], result['metadatas'])
-        ]
-        
         self.logger.info(f"Found {len(result)} documents with missing 'tags' field.")
         
         
@@ -261,12 +552,12 @@ class DataFetcher:
             self.logger.info(f"Processing document {i + 1}, entry metadata: {entry['metadata']}")
             
             metadata = entry['metadata']
-            summary = entry['document']
+            summary = entry['page_content']
             
             # generate tags
             tags = self.generate_tags_from_summary(summary)
             
-            metadata['tags'] = str(tags)
+            metadata['tags'] = tags
             
             self.db.update_metadata(id=entry['id'], metadata=metadata)
             
@@ -288,26 +579,43 @@ if __name__ == "__main__":
     parser.add_argument("--export", "-ex", action="store_true", help="Export database to json")
     parser.add_argument("--model", "-m", type=str, help="Model name: ust, hf or ollama", default="none")
     parser.add_argument("--start_page", "-sp", type=int, help="Start page for fetching data", default=1)
+    parser.add_argument("--from", dest="from_datetime", type=str, help="Start of the fetch window, ISO format, e.g. 2025-04-01T00:00:00")
+    parser.add_argument("--to", dest="to_datetime", type=str, help="End of the fetch window, ISO format")
+    parser.add_argument("--since_last", "-sl", action="store_true", help="Fetch from the end of the last completed window")
+    parser.add_argument("--resume", "-rs", action="store_true", help="Re-run the last window that did not complete, skipping finished work")
+    parser.add_argument("--migrate_tags", "-mt", action="store_true", help="Convert article tags to structured storage and rebuild the tag index")
     
     args = parser.parse_args()
     
-    rag_db = RagDatabase()
+    config = ServerConfig()
+    rag_db = RagDatabase(config)
     
     # check if gpu available
     if not args.model or args.model == "none":
-        data_fetcher = DataFetcher(load_model=False, rag_db=rag_db)
+        data_fetcher = DataFetcher(load_model=False, rag_db=rag_db, config=config)
     else:
-        data_fetcher = DataFetcher(load_model=True, model=args.model, rag_db=rag_db)
+        data_fetcher = DataFetcher(load_model=True, model=args.model, rag_db=rag_db, config=config)
     
     if args.reset_db:
         data_fetcher.db.reset_database()
+    
+    if args.migrate_tags:
+        data_fetcher.db.migrate_tags()
         
     if args.fetch_everything:
-        data_fetcher.fetch_data(fetch_type="everything", hours_count=args.hours_count, start_page=args.start_page)
+        data_fetcher.fetch_data(
+            fetch_type="everything",
+            hours_count=args.hours_count,
+            start_page=args.start_page,
+            start_datetime=args.from_datetime,
+            end_datetime=args.to_datetime,
+            since_last=args.since_last,
+            resume=args.resume
+        )
     
 
     if args.fetch_headline:
-        data_fetcher.fetch_data(fetch_type="headline")
+        data_fetcher.fetch_data(fetch_type="headline", resume=args.resume)
     
     if args.clean:
         data_fetcher.clear_old_news()
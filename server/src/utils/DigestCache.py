@@ -0,0 +1,87 @@
+""" DigestCache.py
+Cache of daily news digests per (user_id, workspace_id).
+A digest only changes when new articles are ingested or the workspace's interests change,
+so entries are dropped on those events rather than recomputed on every request.
+Entries also keep the article snapshot they were computed on, so an ingestion of another
+process (e.g. the DataFetcher CLI) drops them on the next lookup.
+"""
+import time
+import threading
+
+
+class DailyDigestCache:
+    def __init__(self, ttl=43200, active_window=86400):
+        self.ttl = ttl
+        self.active_window = active_window
+        # (user_id, workspace_id) -> (digest, created_at, snapshot)
+        self.entries = {}
+        # (user_id, workspace_id) -> last request time, used to pick workspaces to warm
+        self.last_access = {}
+        self.lock = threading.Lock()
+        # bumped on invalidation so digests computed before it are not stored:
+        # version by ingestion (every workspace), workspace_versions by interest changes of one workspace
+        self.version = 0
+        self.workspace_versions = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id, workspace_id, snapshot=None):
+        """
+        :param snapshot: current article snapshot, entries of other snapshots are dropped
+        """
+        key = (user_id, workspace_id)
+        now = time.time()
+        with self.lock:
+            self.last_access[key] = now
+            entry = self.entries.get(key)
+            if entry is None or now - entry[1] > self.ttl or entry[2] != snapshot:
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def version_of(self, workspace_id):
+        # snapshot to pass to set() once the digest is computed
+        with self.lock:
+            return (self.version, self.workspace_versions.get(workspace_id, 0))
+
+    def set(self, user_id, workspace_id, digest, version=None, snapshot=None):
+        """
+        :param version: version_of(workspace_id) taken before computing the digest, None to always store
+        :param snapshot: article snapshot taken before computing the digest
+        """
+        with self.lock:
+            if version is not None and version != (self.version, self.workspace_versions.get(workspace_id, 0)):
+                return False
+            self.entries[(user_id, workspace_id)] = (digest, time.time(), snapshot)
+            return True
+
+    def invalidate_workspace(self, workspace_id):
+        # digests of other workspaces being computed stay valid
+        with self.lock:
+            self.workspace_versions[workspace_id] = self.workspace_versions.get(workspace_id, 0) + 1
+            for key in [key for key in self.entries if key[1] == workspace_id]:
+                del self.entries[key]
+
+    def invalidate_all(self):
+        with self.lock:
+            self.version += 1
+            self.entries.clear()
+
+    def active_workspaces(self):
+        # workspaces that requested a digest recently
+        now = time.time()
+        with self.lock:
+            for key in [key for key, accessed in self.last_access.items() if now - accessed > self.active_window]:
+                del self.last_access[key]
+            return list(self.last_access.keys())
+
+    def stats(self):
+        with self.lock:
+            return {
+                "size": len(self.entries),
+                "active_workspaces": len(self.last_access),
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,48 @@
+""" EmbeddingCache.py
+LRU + TTL cache of query embeddings, keyed on normalized query text.
+"""
+import threading
+from cachetools import TTLCache
+
+
+class QueryEmbeddingCache:
+    def __init__(self, maxsize=1024, ttl=3600):
+        # TTLCache evicts the least recently used entry when full
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(query):
+        # lower case and collapse whitespace so trivially different queries share an entry
+        return " ".join(query.lower().split())
+
+    def get(self, query):
+        key = self.normalize(query)
+        with self.lock:
+            embedding = self.cache.get(key)
+            if embedding is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return embedding
+
+    def set(self, query, embedding):
+        with self.lock:
+            self.cache[self.normalize(query)] = embedding
+
+    def clear(self):
+        with self.lock:
+            self.cache.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.cache),
+                "maxsize": self.cache.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0
+            }
@@ -0,0 +1,161 @@
+""" HttpClient.py
+Pooled HTTP client for the news APIs.
+One keep-alive session is shared by DataFetcher and Query, requests have timeouts and
+are retried with exponential backoff on connection errors, 429 and 5xx responses.
+A 429 pauses every request of the client until its Retry-After has passed.
+Base URLs can be overridden with NEWS_API_URL / THE_NEWS_API_URL, e.g. to point at
+a local stub server (see benchmarks/news_api_stub.py).
+"""
+import os
+import time
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+from .Logger import setup_logger
+
+DEFAULT_NEWS_API_URL = "https://newsapi.org/v2"
+DEFAULT_THE_NEWS_API_URL = "https://api.thenewsapi.com/v1"
+
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+# read on every call, .env is loaded after this module is imported
+def news_api_url():
+    return os.getenv("NEWS_API_URL", DEFAULT_NEWS_API_URL)
+
+
+def the_news_api_url():
+    return os.getenv("THE_NEWS_API_URL", DEFAULT_THE_NEWS_API_URL)
+
+
+class HttpRequestError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class HttpClient:
+    def __init__(self, pool_size=10, connect_timeout=5, read_timeout=30, max_retries=3, backoff_factor=1.0, max_backoff=60, min_interval=0.0):
+        """
+        :param backoff_factor: the n-th retry waits backoff_factor * 2^(n-1) seconds, capped at max_backoff
+        :param min_interval: minimum seconds between the start of two requests, across all threads
+        """
+        self.logger = setup_logger("http", stream=False)
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.min_interval = min_interval
+        self.pool_size = pool_size
+
+        # retries are handled here so 429 can pause all threads, not only the one that got it
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        # earliest time the next request may start
+        self.next_request_time = 0.0
+        self.rate_lock = threading.Lock()
+
+    def wait_for_slot(self):
+        with self.rate_lock:
+            now = time.time()
+            start_time = max(now, self.next_request_time)
+            self.next_request_time = start_time + self.min_interval
+        if start_time > now:
+            time.sleep(start_time - now)
+
+    def pause(self, seconds):
+        # rate limited by the server, hold back every request of this client
+        with self.rate_lock:
+            self.next_request_time = max(self.next_request_time, time.time() + seconds)
+
+    def backoff(self, attempt):
+        return min(self.max_backoff, self.backoff_factor * 2 ** attempt)
+
+    @staticmethod
+    def retry_after(response):
+        try:
+            return float(response.headers.get("Retry-After"))
+        except (TypeError, ValueError):
+            return None
+
+    def get_json(self, url, params=None):
+        """
+        GET a JSON document, retrying transient failures.
+        :raises HttpRequestError: on a non-retryable status or when retries are exhausted
+        """
+        for attempt in range(self.max_retries + 1):
+            self.wait_for_slot()
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = HttpRequestError(f"Request to {url} failed: {e}")
+                delay = self.backoff(attempt)
+            else:
+                if response.status_code == 200:
+                    try:
+                        return response.json()
+                    except ValueError:
+                        raise HttpRequestError(f"Request to {url} returned invalid JSON: {response.text[:200]}", response.status_code)
+
+                error = HttpRequestError(f"Request to {url} returned {response.status_code}: {response.text[:200]}", response.status_code)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    raise error
+
+                delay = self.retry_after(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                else:
+                    # a huge, negative or nan header must not stall every request of the shared client
+                    delay = max(0.0, min(self.max_backoff, delay))
+                if response.status_code == 429:
+                    self.pause(delay)
+
+            if attempt < self.max_retries:
+                self.logger.warning(f"{error}, retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+        raise error
+
+    def get_json_many(self, requests_params, workers=4):
+        """
+        Fetch many documents concurrently over the shared pool.
+        :param requests_params: list of (url, params)
+        :return: list of JSON documents or HttpRequestError, in the same order
+        """
+        def fetch(request):
+            try:
+                return self.get_json(*request)
+            except HttpRequestError as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, self.pool_size))) as executor:
+            return list(executor.map(fetch, requests_params))
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_http_client(config):
+    # one pool per process, shared by the server routes and ingestion
+    global _client
+    with _client_lock:
+        if _client is None:
+            http_config = config.http
+            _client = HttpClient(
+                pool_size=http_config["pool_size"],
+                connect_timeout=http_config["connect_timeout"],
+                read_timeout=http_config["read_timeout"],
+                max_retries=http_config["max_retries"],
+                backoff_factor=http_config["backoff_factor"],
+                min_interval=http_config["min_interval"]
+            )
+        return _client
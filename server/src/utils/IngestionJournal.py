@@ -0,0 +1,170 @@
+""" IngestionJournal.py
+Checkpoint log of ingestion runs, persisted in SQLite.
+Every fetch window, page and article url is recorded with its status, so a re-run of the
+same window skips finished pages and articles and only retries failed ones, and a new run
+can start where the last completed window ended.
+"""
+import time
+import threading
+
+from .Logger import setup_logger
+from ..databases.Storage import get_storage
+
+# item statuses after which the article needs no more work in its window
+DONE_STATUSES = ("stored", "skipped")
+
+
+class IngestionJournal:
+    def __init__(self, database_path):
+        self.logger = setup_logger("ingestionJournal", stream=False)
+
+        # per-thread connections in WAL mode, shared with the other tables of the file
+        self.db = get_storage(database_path)
+        self.lock = threading.Lock()
+
+        self.create_table()
+
+    def create_table(self):
+        with self.lock:
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_windows (
+                    window_id TEXT PRIMARY KEY,
+                    fetch_type TEXT,
+                    start_time TEXT,
+                    end_time TEXT,
+                    status TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_pages (
+                    window_id TEXT,
+                    page INTEGER,
+                    status TEXT,
+                    article_count INTEGER,
+                    updated_at REAL,
+                    PRIMARY KEY (window_id, page)
+                )
+            """)
+            self.db.execute("""
+                CREATE TABLE IF NOT EXISTS ingestion_items (
+                    window_id TEXT,
+                    url TEXT,
+                    page INTEGER,
+                    status TEXT,
+                    error TEXT,
+                    updated_at REAL,
+                    PRIMARY KEY (window_id, url)
+                )
+            """)
+            self.db.execute("CREATE INDEX IF NOT EXISTS idx_ingestion_windows_type ON ingestion_windows (fetch_type, status, end_time)")
+            self.db.commit()
+
+    @staticmethod
+    def window_id(fetch_type, start_time, end_time):
+        return f"{fetch_type}:{start_time}:{end_time}"
+
+    '''
+    Windows
+    '''
+    def start_window(self, fetch_type, start_time, end_time):
+        # re-running a window keeps its pages and items, so finished work is skipped
+        window_id = self.window_id(fetch_type, start_time, end_time)
+        now = time.time()
+        with self.lock:
+            self.db.execute("""
+                INSERT INTO ingestion_windows (window_id, fetch_type, start_time, end_time, status, created_at, updated_at)
+                VALUES (?, ?, ?, ?, 'running', ?, ?)
+                ON CONFLICT (window_id) DO UPDATE SET status='running', updated_at=excluded.updated_at
+            """, (window_id, fetch_type, start_time, end_time, now, now))
+            self.db.commit()
+        return window_id
+
+    def finish_window(self, window_id, status):
+        """
+        :param status: "completed" when every page and item finished, "partial" otherwise
+        """
+        with self.lock:
+            self.db.execute("UPDATE ingestion_windows SET status=?, updated_at=? WHERE window_id=?", (status, time.time(), window_id))
+            self.db.commit()
+
+    def last_completed_end(self, fetch_type):
+        # end of the latest window that fully completed, new runs fetch from there
+        with self.lock:
+            row = self.db.execute("""
+                SELECT MAX(end_time) FROM ingestion_windows WHERE fetch_type=? AND status='completed'
+            """, (fetch_type,)).fetchone()
+        return row[0] if row else None
+
+    def last_unfinished_window(self, fetch_type):
+        # latest window that was interrupted or left failed items, as (start_time, end_time)
+        with self.lock:
+            return self.db.execute("""
+                SELECT start_time, end_time FROM ingestion_windows
+                WHERE fetch_type=? AND status != 'completed'
+                ORDER BY created_at DESC LIMIT 1
+            """, (fetch_type,)).fetchone()
+
+    '''
+    Pages
+    '''
+    def set_page_status(self, window_id, page, status, article_count=None):
+        with self.lock:
+            self.db.execute("""
+                INSERT INTO ingestion_pages (window_id, page, status, article_count, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (window_id, page) DO UPDATE SET
+                    status=excluded.status,
+                    article_count=COALESCE(excluded.article_count, article_count),
+                    updated_at=excluded.updated_at
+            """, (window_id, page, status, article_count, time.time()))
+            self.db.commit()
+
+    def completed_pages(self, window_id):
+        with self.lock:
+            rows = self.db.execute("SELECT page FROM ingestion_pages WHERE window_id=? AND status='completed'", (window_id,)).fetchall()
+        return {row[0] for row in rows}
+
+    '''
+    Items
+    '''
+    def set_item_status(self, window_id, url, status, page=None, error=None):
+        """
+        :param status: "crawled", "summarized", "stored", "failed" or "skipped"
+        """
+        with self.lock:
+            self.db.execute("""
+                INSERT INTO ingestion_items (window_id, url, page, status, error, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (window_id, url) DO UPDATE SET
+                    status=excluded.status,
+                    page=COALESCE(excluded.page, page),
+                    error=excluded.error,
+                    updated_at=excluded.updated_at
+            """, (window_id, url, page, status, error, time.time()))
+            self.db.commit()
+
+    def done_urls(self, window_id, urls):
+        # urls of the window that were stored or skipped in an earlier run
+        if not urls:
+            return set()
+        placeholders = ",".join("?" * len(urls))
+        with self.lock:
+            rows = self.db.execute(f"""
+                SELECT url FROM ingestion_items
+                WHERE window_id=? AND status IN ({",".join("?" * len(DONE_STATUSES))}) AND url IN ({placeholders})
+            """, (window_id, *DONE_STATUSES, *urls)).fetchall()
+        return {row[0] for row in rows}
+
+    def pending_count(self, window_id, page):
+        # items of a page that were started but neither stored nor skipped
+        with self.lock:
+            row = self.db.execute(f"""
+                SELECT COUNT(*) FROM ingestion_items
+                WHERE window_id=? AND page=? AND status NOT IN ({",".join("?" * len(DONE_STATUSES))})
+            """, (window_id, page, *DONE_STATUSES)).fetchone()
+        return row[0]
+
+    def item_counts(self, window_id):
+        with self.lock:
+            rows = self.db.execute("SELECT status, COUNT(*) FROM ingestion_items WHERE window_id=? GROUP BY status", (window_id,)).fetchall()
+        return dict(rows)
@@ -0,0 +1,184 @@
+""" IngestionPipeline.py
+Staged worker pipeline for article ingestion.
+Each stage owns a pool of worker threads and reads from a bounded queue, so a slow
+stage blocks the stage in front of it (backpressure) instead of buffering unboundedly.
+"""
+import time
+import queue
+import threading
+
+from .Logger import setup_logger
+
+# marks the end of input for one worker
+_STOP = object()
+
+
+class StageStats:
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.processed = 0
+        self.dropped = 0
+        self.failed = 0
+        self.busy_time = 0.0
+        self.start_time = None
+        self.end_time = None
+        self.lock = threading.Lock()
+
+    def record(self, duration, produced, failed=False):
+        with self.lock:
+            self.busy_time += duration
+            if failed:
+                self.failed += 1
+            elif produced:
+                self.processed += 1
+            else:
+                self.dropped += 1
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        end_time = self.end_time if self.end_time else time.time()
+        return end_time - self.start_time
+
+    def throughput(self):
+        # items per second of wall clock time the stage was alive
+        elapsed = self.elapsed()
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "busy_time": round(self.busy_time, 3),
+            "elapsed": round(self.elapsed(), 3),
+            "throughput": round(self.throughput(), 3),
+        }
+
+
+class Stage:
+    """
+    One pipeline step.
+    :param func: callable taking one item and returning the item for the next stage,
+                 or None to drop it (e.g. article skipped or failed)
+    :param workers: number of worker threads for this stage
+    :param queue_size: capacity of the input queue of this stage
+    :param batch_size: if larger than 1, func takes a list of up to batch_size items and returns
+                       a list of results in the same order (None to drop an item)
+    :param batch_timeout: seconds a worker waits for more items before running a partial batch
+    """
+    def __init__(self, name, func, workers=1, queue_size=100, batch_size=1, batch_timeout=1.0):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.batch_size = max(1, batch_size)
+        self.batch_timeout = batch_timeout
+
+
+class IngestionPipeline:
+    def __init__(self, stages, logger=None):
+        self.stages = stages
+        self.logger = logger if logger else setup_logger("pipeline", stream=False)
+        self.stats = [StageStats(stage.name, stage.workers) for stage in stages]
+
+    def _worker(self, index, in_queue, out_queue):
+        stage = self.stages[index]
+        stats = self.stats[index]
+
+        while True:
+            items, stopped = self._take(in_queue, stage)
+            if items:
+                self._process(stage, stats, items, out_queue)
+            if stopped:
+                break
+
+    def _take(self, in_queue, stage):
+        # block for the first item, then collect what arrives within batch_timeout
+        items = []
+        deadline = None
+        while len(items) < stage.batch_size:
+            if deadline is None:
+                item = in_queue.get()
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = in_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if item is _STOP:
+                return items, True
+            items.append(item)
+            if deadline is None:
+                deadline = time.time() + stage.batch_timeout
+        return items, False
+
+    def _process(self, stage, stats, items, out_queue):
+        start_time = time.time()
+        try:
+            if stage.batch_size > 1:
+                results = stage.func(items)
+            else:
+                results = [stage.func(items[0])]
+        except Exception as e:
+            self.logger.error(f"Stage {stage.name} failed on {len(items)} items: {e}")
+            for _ in items:
+                stats.record((time.time() - start_time) / len(items), produced=False, failed=True)
+            return
+
+        duration = (time.time() - start_time) / len(items)
+        for result in results:
+            stats.record(duration, produced=result is not None)
+            if result is not None and out_queue is not None:
+                # blocks when the next stage is saturated
+                out_queue.put(result)
+
+    def run(self, items):
+        queues = [queue.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        threads = []
+
+        for i, stage in enumerate(self.stages):
+            out_queue = queues[i + 1] if i + 1 < len(self.stages) else None
+            stage_threads = [
+                threading.Thread(
+                    target=self._worker,
+                    args=(i, queues[i], out_queue),
+                    name=f"{stage.name}-{n}",
+                    daemon=True
+                )
+                for n in range(stage.workers)
+            ]
+            self.stats[i].start_time = time.time()
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+
+        # feed the first stage, blocking whenever it is full
+        for item in items:
+            queues[0].put(item)
+
+        # shut the stages down in order so every item is drained downstream
+        for i, stage in enumerate(self.stages):
+            for _ in range(stage.workers):
+                queues[i].put(_STOP)
+            for thread in threads[i]:
+                thread.join()
+            self.stats[i].end_time = time.time()
+
+        return self.report()
+
+    def report(self):
+        report = [stats.to_dict() for stats in self.stats]
+        for entry in report:
+            self.logger.info(
+                f"Stage {entry['stage']} ({entry['workers']} workers): "
+                f"processed={entry['processed']}, dropped={entry['dropped']}, failed={entry['failed']}, "
+                f"busy={entry['busy_time']}s, elapsed={entry['elapsed']}s, throughput={entry['throughput']} items/s"
+            )
+        return report
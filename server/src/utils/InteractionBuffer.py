@@ -0,0 +1,183 @@
+""" InteractionBuffer.py
+Write-behind buffer of article interactions (clicks and bookmarks).
+Routes append an event and return right away; a background thread applies the waiting events
+as one batch once flush_size events are buffered or flush_interval seconds have passed, so
+repeated (workspace, tag) deltas are merged into one upsert per workspace.
+Events are appended to a local log before they are acknowledged and the log is replayed on
+startup, so buffered events survive a crash. Replay is at-least-once: a crash between applying
+a batch and removing its log applies that batch again.
+"""
+import os
+import json
+import time
+import threading
+
+from .Logger import setup_logger
+
+INTERACTIONS = ["click", "bookmark"]
+
+
+class InteractionBuffer:
+    def __init__(self, interest_db, flush_interval=2.0, flush_size=256, log_path=None, fsync=False):
+        """
+        :param interest_db: InterestDatabase the events are applied to
+        :param log_path: append-only log of buffered events, None to keep them in memory only
+        :param fsync: sync the log to disk on every event, survives power loss and not only process crashes
+        """
+        self.logger = setup_logger("interactionBuffer", stream=False)
+        self.interest_db = interest_db
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.fsync = fsync
+
+        # (article_id, user_id, workspace_id, interaction, time) not applied yet
+        self.events = []
+        self.lock = threading.Lock()
+        # one flush at a time, the log is rotated while a batch is applied
+        self.flush_lock = threading.Lock()
+
+        self.log_path = os.path.abspath(log_path) if log_path else None
+        self.log_file = None
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            self.replay()
+
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name="interaction-flush", daemon=True)
+        self.thread.start()
+
+    '''
+    Log
+    '''
+    @property
+    def flushing_path(self):
+        # events of the batch being applied
+        return self.log_path + ".flushing"
+
+    def read_log(self, path):
+        events = []
+        if not os.path.exists(path):
+            return events
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(tuple(json.loads(line)))
+                except json.JSONDecodeError:
+                    # a line torn by the crash, its event was never acknowledged
+                    self.logger.warning(f"Skipping malformed line in {path}: {line[:200]}")
+        return events
+
+    def write_log(self, events):
+        # caller holds the lock, replaces the log with exactly the given events
+        if self.log_file:
+            self.log_file.close()
+        temp_path = self.log_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.log_path)
+        self.log_file = open(self.log_path, "a", encoding="utf-8")
+
+    def replay(self):
+        # events of an interrupted flush and events never flushed are buffered again
+        events = self.read_log(self.flushing_path) + self.read_log(self.log_path)
+        with self.lock:
+            self.events = events
+            self.write_log(events)
+        if os.path.exists(self.flushing_path):
+            os.remove(self.flushing_path)
+        if events:
+            self.logger.info(f"Replayed {len(events)} buffered interactions from {self.log_path}")
+
+    '''
+    Events
+    '''
+    def add(self, article_id, user_id, workspace_id, interaction="click"):
+        if interaction not in INTERACTIONS:
+            raise ValueError(f"Invalid interaction: {interaction}")
+
+        event = (article_id, user_id, workspace_id, interaction, time.time())
+        with self.lock:
+            if self.log_file:
+                self.log_file.write(json.dumps(event) + "\n")
+                self.log_file.flush()
+                if self.fsync:
+                    os.fsync(self.log_file.fileno())
+            self.events.append(event)
+            full = len(self.events) >= self.flush_size
+
+        if full:
+            self.wake.set()
+
+    def pending(self):
+        with self.lock:
+            return len(self.events)
+
+    def flush(self):
+        """
+        Apply the buffered events.
+        :return: number of events applied
+        """
+        with self.flush_lock:
+            with self.lock:
+                if not self.events:
+                    return 0
+                events, self.events = self.events, []
+                # events added from now on go to a new log
+                if self.log_file:
+                    self.log_file.close()
+                    os.replace(self.log_path, self.flushing_path)
+                    self.log_file = open(self.log_path, "a", encoding="utf-8")
+
+            start_time = time.time()
+            try:
+                self.interest_db.interact_with_articles([event[:4] for event in events])
+            except Exception as e:
+                self.logger.error(f"Failed to apply {len(events)} interactions, keeping them buffered: {e}")
+                with self.lock:
+                    self.events = events + self.events
+                    if self.log_file:
+                        self.write_log(self.events)
+                        os.remove(self.flushing_path)
+                return 0
+
+            if self.log_path:
+                os.remove(self.flushing_path)
+            self.logger.info(f"Flushed {len(events)} interactions in {time.time() - start_time:.3f}s")
+            return len(events)
+
+    def discard_workspace(self, workspace_id):
+        # pending events of a workspace whose profile is reset
+        with self.flush_lock, self.lock:
+            self.events = [event for event in self.events if event[2] != workspace_id]
+            if self.log_file:
+                self.write_log(self.events)
+
+    def clear(self):
+        with self.flush_lock, self.lock:
+            self.events = []
+            if self.log_file:
+                self.write_log(self.events)
+
+    def run(self):
+        # flush every flush_interval seconds, or earlier once flush_size events are waiting
+        while not self.stopped.is_set():
+            self.wake.wait(timeout=self.flush_interval)
+            self.wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"Interaction flush failed: {e}")
+
+    def shutdown(self):
+        self.stopped.set()
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        with self.lock:
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
@@ -0,0 +1,185 @@
+""" JobManager.py
+Background ingestion jobs started from the API.
+A job runs DataFetcher.fetch_data on its own thread pool, so the request that started it
+returns a job id right away and the server stays responsive during hours-long fetches.
+Jobs report progress through fetch_data's progress hook, can be cancelled between articles,
+and a job is rejected while another active job of the same fetch type covers an overlapping window.
+Cancelled and failed windows are resumable, the ingestion journal keeps their finished work.
+"""
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from .Logger import setup_logger
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobConflictError(Exception):
+    def __init__(self, message, job):
+        super().__init__(message)
+        self.job = job
+
+
+class IngestionJob:
+    def __init__(self, fetch_type, start_datetime, end_datetime):
+        self.job_id = str(uuid.uuid4())
+        self.fetch_type = fetch_type
+        self.start_datetime = start_datetime
+        self.end_datetime = end_datetime
+
+        # queued -> running -> completed / partial / failed / cancelled
+        # partial: the window has failed pages or articles, resubmitting it retries them
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+        self.cancel_event = threading.Event()
+        self.lock = threading.Lock()
+        self.progress = {
+            "window_id": None,
+            "page_count": None,
+            "pages_completed": 0,
+            "pages_failed": 0,
+            "items": {},
+            "stage_totals": {}
+        }
+
+    def update(self, **fields):
+        # progress hook of fetch_data, called from the job's thread
+        with self.lock:
+            self.progress.update(fields)
+
+    def overlaps(self, fetch_type, start_datetime, end_datetime):
+        if fetch_type != self.fetch_type:
+            return False
+        # headline windows have no range, the same hour is the same window
+        if (start_datetime, end_datetime) == (self.start_datetime, self.end_datetime):
+            return True
+        return start_datetime < self.end_datetime and self.start_datetime < end_datetime
+
+    def to_dict(self):
+        with self.lock:
+            progress = dict(self.progress)
+
+        elapsed = None
+        if self.started_at:
+            elapsed = (self.finished_at or time.time()) - self.started_at
+        stored = progress["stage_totals"].get("insert", {}).get("processed", 0)
+        return {
+            "job_id": self.job_id,
+            "fetch_type": self.fetch_type,
+            "start_datetime": self.start_datetime,
+            "end_datetime": self.end_datetime,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": elapsed,
+            "progress": progress,
+            "throughput": stored / elapsed if elapsed else 0.0
+        }
+
+
+class JobManager:
+    def __init__(self, data_fetcher, max_jobs=1, history_size=50):
+        """
+        :param max_jobs: jobs running at once, later jobs wait in the queue
+        :param history_size: finished jobs kept for the status endpoints
+        """
+        self.logger = setup_logger("jobManager", stream=False)
+        self.data_fetcher = data_fetcher
+        self.history_size = history_size
+
+        # separate from the request executor, a long fetch must not hold a request worker
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs, thread_name_prefix="ingestion")
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, fetch_type, hours_count=12, start_datetime=None, end_datetime=None, since_last=False, resume=False):
+        """
+        :return: the queued job
+        :raises JobConflictError: if an active job of the fetch type overlaps the window
+        """
+        # resolved now, so overlapping requests are detected before either starts
+        start_datetime, end_datetime = self.data_fetcher.resolve_window(fetch_type, hours_count, start_datetime, end_datetime, since_last, resume)
+
+        with self.lock:
+            for job in self.jobs.values():
+                if job.status in ACTIVE_STATUSES and job.overlaps(fetch_type, start_datetime, end_datetime):
+                    raise JobConflictError(f"Window {start_datetime} - {end_datetime} overlaps job {job.job_id} ({job.start_datetime} - {job.end_datetime})", job)
+
+            job = IngestionJob(fetch_type, start_datetime, end_datetime)
+            self.jobs[job.job_id] = job
+            self.trim_history()
+
+        self.logger.info(f"Queued job {job.job_id}: {fetch_type} {start_datetime} - {end_datetime}")
+        self.executor.submit(self.run, job)
+        return job
+
+    def run(self, job):
+        with job.lock:
+            # cancelled while queued
+            if job.cancel_event.is_set():
+                return
+            job.status = "running"
+            job.started_at = time.time()
+        self.logger.info(f"Started job {job.job_id}")
+        try:
+            result = self.data_fetcher.fetch_data(
+                fetch_type=job.fetch_type,
+                start_datetime=job.start_datetime,
+                end_datetime=job.end_datetime,
+                progress=job.update,
+                cancel_event=job.cancel_event
+            )
+            job.error = result["error"]
+            job.status = "cancelled" if job.cancel_event.is_set() else result["status"]
+        except Exception as e:
+            self.logger.error(f"Job {job.job_id} failed: {e}")
+            job.error = str(e)
+            job.status = "failed"
+        job.finished_at = time.time()
+        self.logger.info(f"Job {job.job_id} {job.status}: {job.to_dict()['progress']}")
+
+    def trim_history(self):
+        # caller holds the lock, active jobs are never dropped
+        finished = [job_id for job_id, job in self.jobs.items() if job.status not in ACTIVE_STATUSES]
+        for job_id in finished[:max(0, len(finished) - self.history_size)]:
+            del self.jobs[job_id]
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def cancel(self, job_id):
+        """
+        :return: the job, None if unknown
+        A running job stops after the articles in flight; a queued one never starts.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return None
+
+        with job.lock:
+            if job.status in ACTIVE_STATUSES:
+                job.cancel_event.set()
+                self.logger.info(f"Cancelling job {job_id}")
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished_at = time.time()
+        return job
+
+    def shutdown(self):
+        for job in self.list():
+            job.cancel_event.set()
+        self.executor.shutdown(wait=False, cancel_futures=True)
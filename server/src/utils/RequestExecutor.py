@@ -0,0 +1,66 @@
+""" RequestExecutor.py
+Runs the work of API routes without blocking the event loop.
+Synchronous database and model calls go to a bounded thread pool, coroutines are awaited
+directly, and each route group has its own concurrency limit so a burst of slow requests
+(e.g. queries waiting on the LLM) cannot take every worker from the cheap ones.
+"""
+import asyncio
+import inspect
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class RequestExecutor:
+    def __init__(self, max_workers=32, route_limits=None):
+        """
+        :param max_workers: threads shared by all blocking work of the server
+        :param route_limits: dict of route group -> maximum requests of the group running at once,
+                             groups without a limit only share the thread pool
+        """
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="request")
+        self.route_limits = route_limits if route_limits else {}
+        # created on first use, semaphores belong to the running event loop
+        self.semaphores = {}
+
+    def install(self, loop):
+        # asyncio.to_thread (e.g. TaskGraph steps) uses the loop's default executor, bound it too
+        loop.set_default_executor(self.executor)
+
+    def limit(self, route):
+        if route not in self.route_limits:
+            return _NoLimit()
+        if route not in self.semaphores:
+            self.semaphores[route] = asyncio.Semaphore(self.route_limits[route])
+        return self.semaphores[route]
+
+    async def run(self, route, func, *args, **kwargs):
+        """
+        Run func(*args, **kwargs) under the limit of route.
+        Coroutine functions are awaited, plain functions run in the thread pool.
+        """
+        async with self.limit(route):
+            if inspect.iscoroutinefunction(func):
+                return await func(*args, **kwargs)
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def stats(self):
+        return {
+            route: {
+                "limit": limit,
+                # free slots of the semaphore, its counter is not public
+                "available": self.semaphores[route]._value if route in self.semaphores else limit
+            }
+            for route, limit in self.route_limits.items()
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class _NoLimit:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
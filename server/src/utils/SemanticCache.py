@@ -0,0 +1,105 @@
+""" SemanticCache.py
+Cache of query responses per workspace, looked up by embedding similarity of the
+postprocessed query, so rephrasings of the same question ("AI news today",
+"what's new in AI") share one answer.
+Entries are bound to the article snapshot they were computed on and dropped when it changes.
+"""
+import time
+import threading
+import numpy as np
+from collections import OrderedDict
+
+
+class SemanticResponseCache:
+    def __init__(self, threshold=0.92, ttl=1800, max_entries=32, max_workspaces=256):
+        """
+        :param threshold: minimum cosine similarity between query embeddings to reuse a response
+        :param max_entries: responses kept per workspace, least recently used dropped first
+        :param max_workspaces: workspaces kept, least recently used dropped first
+        """
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_workspaces = max_workspaces
+        # workspace_id -> [entry], most recently used last
+        # entry: {"embedding", "response", "article_ids", "version", "created_at"}
+        self.workspaces = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(embedding):
+        embedding = np.asarray(embedding, dtype=float)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm > 0 else embedding
+
+    def get(self, workspace_id, embedding, version, exclude_ids=None):
+        """
+        :param version: current article snapshot, entries of other snapshots are dropped
+        :param exclude_ids: article ids that must not be in the response, e.g. already recommended
+        :return: cached response or None
+        """
+        now = time.time()
+        embedding = self.normalize(embedding)
+        exclude_ids = set(exclude_ids) if exclude_ids else set()
+
+        with self.lock:
+            entries = self.workspaces.get(workspace_id)
+            if entries:
+                entries[:] = [
+                    entry for entry in entries
+                    if entry["version"] == version and now - entry["created_at"] <= self.ttl
+                ]
+
+            if not entries:
+                self.workspaces.pop(workspace_id, None)
+                self.misses += 1
+                return None
+
+            similarities = np.stack([entry["embedding"] for entry in entries]) @ embedding
+            best = int(np.argmax(similarities))
+            entry = entries[best]
+            if similarities[best] < self.threshold or entry["article_ids"] & exclude_ids:
+                self.misses += 1
+                return None
+
+            # move to the end as most recently used
+            entries.append(entries.pop(best))
+            self.workspaces.move_to_end(workspace_id)
+            self.hits += 1
+            return entry["response"]
+
+    def set(self, workspace_id, embedding, response, version):
+        entry = {
+            "embedding": self.normalize(embedding),
+            "response": response,
+            "article_ids": {article["id"] for article in response["articles"]},
+            "version": version,
+            "created_at": time.time()
+        }
+
+        with self.lock:
+            entries = self.workspaces.setdefault(workspace_id, [])
+            entries.append(entry)
+            if len(entries) > self.max_entries:
+                del entries[0]
+
+            self.workspaces.move_to_end(workspace_id)
+            while len(self.workspaces) > self.max_workspaces:
+                self.workspaces.popitem(last=False)
+
+    def invalidate_all(self):
+        with self.lock:
+            self.workspaces.clear()
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "workspaces": len(self.workspaces),
+                "size": sum(len(entries) for entries in self.workspaces.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total > 0 else 0.0
+            }
@@ -25,6 +25,13 @@ class ServerConfig:
             
             self.tags = self.config["tags"]
             self.query = self.config["query"]
+            self.ingestion = self.config["ingestion"]
+            self.embedding = self.config["embedding"]
+            self.model = self.config["model"]
+            self.daily_news = self.config["daily_news"]
+            self.http = self.config["http"]
+            self.interactions = self.config["interactions"]
+            self.server = self.config["server"]
             
             
         except FileNotFoundError:
@@ -0,0 +1,28 @@
+""" Tags.py
+Conversion of article tags between lists and their stored string form.
+Tags are stored as JSON; collections written before that hold str(list) values.
+"""
+import ast
+import json
+
+
+def parse_tags(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return list(value)
+
+    try:
+        tags = json.loads(value)
+    except (TypeError, ValueError):
+        # legacy python literal, e.g. "['ai', 'games']"
+        try:
+            tags = ast.literal_eval(value)
+        except (SyntaxError, ValueError):
+            return []
+
+    return list(tags) if isinstance(tags, (list, tuple)) else []
+
+
+def serialize_tags(tags):
+    return json.dumps(list(tags))
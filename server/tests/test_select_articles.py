@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from types import SimpleNamespace
+
+import numpy as np
+
+from src.query import Query
+
+
+class StubInterestDatabase:
+    def get_tag_scores(self, tags, workspace_id=None):
+        return np.zeros(len(tags))
+
+
+def make_query(embeddings_similarity_weight=0, interest_weight=0):
+    # select_articles only needs the config, the reranker and the interest scores
+    query = Query.__new__(Query)
+    query.config = SimpleNamespace(
+        query={
+            "result_count": 3,
+            "candidate_count": 10,
+            "article_rank_mode": "algo_only",
+            "llm_weight": 1,
+            "embeddings_similarity_weight": embeddings_similarity_weight,
+            "interest_weight": interest_weight
+        },
+        tags={"max_tag_contribution": 0.1}
+    )
+    query.reranker = None
+    query.interest_db = StubInterestDatabase()
+    query.logger = logging.getLogger("test_select_articles")
+    return query
+
+
+def make_doc(article_id, distance=None):
+    doc = {"id": article_id, "page_content": "", "metadata": {"title": article_id, "tags": ["news"]}}
+    if distance is not None:
+        doc["distance"] = distance
+    return doc
+
+
+def test_algo_only_without_weights_follows_distance():
+    docs = [make_doc("far", 1.5), make_doc("near", 0.2), make_doc("mid", 0.7), make_doc("farthest", 2.0)]
+    selected = asyncio.run(make_query().select_articles(docs, "query", workspace_id="w"))
+    assert [doc["id"] for doc in selected] == ["near", "mid", "far"]
+
+
+def test_algo_only_does_not_put_web_results_first():
+    docs = [make_doc("near", 0.1), make_doc("far", 1.9)]
+    web_search_docs = [make_doc("web-1"), make_doc("web-2")]
+    selected = asyncio.run(make_query().select_articles(docs, "query", workspace_id="w", web_search_docs=web_search_docs))
+    # web results have no distance and rank with the average similarity
+    assert [doc["id"] for doc in selected] == ["near", "web-1", "web-2"]